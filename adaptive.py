@@ -0,0 +1,116 @@
+"""Module choosing the Home Data poll interval from signal dynamics and link health."""
+
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Final
+
+_LOGGER = logging.getLogger(__name__)
+
+# Rates of change (unit per second) above which a signal counts as moving
+HOME_DATA_RATES: Final[dict[str, float]] = {
+    "battery_current": 0.2,
+    "charge_power": 5,
+    "controller_temperature": 0.05,
+    "battery_temperature": 0.05,
+}
+
+
+@dataclass(slots=True)
+class Decision:
+    """One interval change and why it was made."""
+
+    when: float
+    interval: float
+    reason: str
+
+
+class AdaptiveInterval:
+    """Poll fast while signals move, back off while steady or congested.
+
+    A signal moving faster than its HOME_DATA_RATES threshold drops the
+    interval straight to min_interval; each steady sample stretches it by
+    backoff up to max_interval. Link errors (timeouts, CRC errors, empty
+    cycles) double a penalty factor, up to max_penalty, that multiplies the
+    interval; each clean cycle halves it again.
+    """
+
+    def __init__(
+        self,
+        block: str = "home",
+        min_interval: float = 0.5,
+        max_interval: float = 10.0,
+        backoff: float = 1.25,
+        rates: dict[str, float] | None = None,
+        max_penalty: float = 8.0,
+    ) -> None:
+        """Start at min_interval with a clean link."""
+        self.block = block
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.rates = HOME_DATA_RATES if rates is None else rates
+        self.max_penalty = max_penalty
+        self.base = min_interval
+        self.penalty = 1.0
+        self.interval = min_interval
+        self.reason = "start"
+        self.decisions: deque[Decision] = deque(maxlen=64)
+        self.speedups = 0
+        self.backoffs = 0
+        self.congested = 0
+        self._last: tuple[float, dict[str, Any]] | None = None
+        self._errors = 0
+
+    def _moving(self, when: float, values: dict[str, Any]) -> str | None:
+        """Return the first signal changing faster than its threshold."""
+        last = self._last
+        self._last = (when, values)
+        if last is None or when <= last[0]:
+            return None
+        elapsed = when - last[0]
+        for name, rate in self.rates.items():
+            old, new = last[1].get(name), values.get(name)
+            if old is not None and new is not None and abs(new - old) / elapsed > rate:
+                return name
+        return None
+
+    def update(self, when: float, values: dict[str, Any], errors: int) -> float:
+        """Feed one poll cycle and return the interval to use next.
+
+        errors is a running total of link errors; only its increase counts.
+        """
+        new_errors, self._errors = errors - self._errors, errors
+        if new_errors > 0 or not values:
+            self.penalty = min(self.penalty * 2, self.max_penalty)
+            self.congested += 1
+            reason = "link errors"
+        else:
+            self.penalty = max(1.0, self.penalty / 2)
+            moving = self._moving(when, values) if any(k in values for k in self.rates) else None
+            if moving is not None:
+                self.base = self.min_interval
+                self.speedups += 1
+                reason = f"{moving} moving"
+            else:
+                self.base = min(self.base * self.backoff, self.max_interval)
+                self.backoffs += 1
+                reason = "steady"
+        interval = min(self.base * self.penalty, self.max_interval * self.max_penalty)
+        if interval != self.interval:
+            self.decisions.append(Decision(when, interval, reason))
+            _LOGGER.debug("interval %.2fs -> %.2fs: %s", self.interval, interval, reason)
+        self.interval = interval
+        self.reason = reason
+        return interval
+
+    def summary(self) -> dict[str, Any]:
+        """Return the current choice and decision counters for tuning."""
+        return {
+            "interval": round(self.interval, 3),
+            "reason": self.reason,
+            "penalty": self.penalty,
+            "speedups": self.speedups,
+            "backoffs": self.backoffs,
+            "congested": self.congested,
+        }
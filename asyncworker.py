@@ -0,0 +1,59 @@
+"""Module running one long-lived asyncio loop beside a GUI or CLI thread."""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncWorker:
+    """Own a single event loop on a dedicated daemon thread.
+
+    All BLE work is submitted here so connections, locks and futures stay
+    bound to one loop for the life of the application.
+    """
+
+    def __init__(self, name: str = "ble-loop") -> None:
+        """Start the loop thread."""
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schedule coro on the loop from any thread."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def call(self, callback: Callable[..., Any], *args: Any) -> None:
+        """Run a plain callback on the loop thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Cancel remaining tasks, stop the loop and join its thread."""
+        if not self._thread.is_alive():
+            return
+
+        def _cancel_all() -> None:
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.call_soon(self.loop.stop)
+
+        self.loop.call_soon_threadsafe(_cancel_all)
+        self._thread.join(timeout)
+
+
+def _log_failure(future: concurrent.futures.Future) -> None:
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if exc is not None:
+        _LOGGER.error("background task failed", exc_info=exc)
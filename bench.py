@@ -0,0 +1,387 @@
+"""Benchmarks for decoding, framing, command building and poll latency.
+
+Run ``python bench.py [-o results.json] [--compare baseline.json]``; results
+are JSON so runs can be diffed, and --compare exits 1 on a regression.
+``--startup-budget MS`` exits 1 when the offline CLI starts slower than that
+over a bare interpreter or loads any of cli.HEAVY_MODULES; importcheck.py
+runs the import half alone, without bench.py's dependencies. The adaptive
+scenario exits 1 when the poll interval does not follow a simulated device
+through steady, moving and lossy phases.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import types
+from collections.abc import Callable
+from typing import Any
+
+from adaptive import AdaptiveInterval
+from bleconn import ConnectionManager
+from commands import COMMANDS
+from drivers import JKDriver, crc_sum
+from fakeble import SimulatedDevice, fake_client_factory
+from framing import FrameReassembler
+from importcheck import heavy_imports
+from modbus import crc16, read_holding, write_multiple
+from poller import PollBlock, Poller
+from registers import HOME_DATA, decode_bms_response, decode_home_data
+from transaction import ModbusClient
+from trends import TrendBuffer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOME_FRAME = SimulatedDevice().reply(COMMANDS["Read Home Data"])
+
+
+def _rate(func: Callable[[], Any], per_call: int = 1) -> float:
+    """Return calls of func per second, timed for at least 0.2 s."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=3, number=number))
+    return round(number * per_call / best, 1)
+
+
+def bench_decode() -> dict[str, Any]:
+    """Home Data decoding, struct path and the GUI's hex/text path."""
+    hex_frame = HOME_FRAME.hex()
+    frames = HOME_FRAME * 10000
+    result = {
+        "decode_home_data_per_s": _rate(lambda: decode_home_data(HOME_FRAME)),
+        # the GUIs' hex in, text out path
+        "decode_bms_response_per_s": _rate(lambda: decode_bms_response(hex_frame)),
+    }
+    try:
+        HOME_DATA.decode_batch(frames)
+    except ImportError as exc:
+        result["decode_batch_per_s"] = f"skipped: {exc}"
+    else:
+        result["decode_batch_per_s"] = _rate(lambda: HOME_DATA.decode_batch(frames), 10000)
+    return result
+
+
+def _stand_in(name: str, **attrs: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__path__ = []  # importable as a package
+
+    def resolve(attr: str) -> Any:
+        # constants such as ATTR_VOLTAGE resolve to their own names, classes
+        # such as BLEDevice to an empty class usable in annotations
+        value = attr if attr.isupper() else type(attr, (), {})
+        setattr(module, attr, value)
+        return value
+
+    module.__getattr__ = resolve
+    module.__dict__.update(attrs)
+    return module
+
+
+def _load_kickass_bms() -> Any:
+    """Load kickass-bms.py, standing in for bleak and the bms_ble integration.
+
+    The stand-ins only satisfy the module's imports; the static decode
+    helpers benchmarked here use none of them. sys.modules is restored.
+    """
+    stand_ins = {"jk_bench": _stand_in("jk_bench")}
+    stand_ins["jk_bench.basebms"] = _stand_in(
+        "jk_bench.basebms", BaseBMS=object, BMSsample=dict, crc_sum=crc_sum
+    )
+    for name in (
+        "bleak",
+        "bleak.backends",
+        "bleak.backends.characteristic",
+        "bleak.backends.device",
+        "bleak.uuids",
+        "custom_components",
+        "custom_components.bms_ble",
+        "custom_components.bms_ble.const",
+    ):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            stand_ins[name] = _stand_in(name)
+    saved = {name: sys.modules.get(name) for name in stand_ins}
+    sys.modules.update(stand_ins)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "jk_bench.kickass_bms", os.path.join(HERE, "kickass-bms.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        for name, previous in saved.items():
+            if previous is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = previous
+
+
+def bench_jk_decode() -> dict[str, Any]:
+    """BMS._decode_data from kickass-bms.py for both JK02 layouts, and JKDriver."""
+    module = _load_kickass_bms()
+    data = bytearray(range(256)) + bytearray(range(44))
+    frame = bytearray(data)
+    frame[:4], frame[JKDriver.TYPE_POS] = JKDriver.HEAD_RSP, JKDriver.CELL_INFO
+    driver = JKDriver()
+    bms = module.BMS
+    sample = {}
+    return {
+        "jk02_32s_per_s": _rate(lambda: bms._decode_data(data, 0)),
+        "jk02_24s_per_s": _rate(lambda: bms._decode_data(data, -32)),
+        "jk02_32s_reuse_per_s": _rate(lambda: bms._decode_data(data, 0, sample)),
+        "jk02_cells_temps_per_s": _rate(
+            lambda: bms._cell_voltages(data, 16, bms._temp_sensors(data, 0, sample))
+        ),
+        "jk_driver_decode_per_s": _rate(lambda: driver.decode(frame)),
+    }
+
+
+def bench_trends(columns: int = 1200) -> dict[str, Any]:
+    """Trend buffer appends and a 24 h, 10 Hz window decimated to columns."""
+    try:
+        trends = TrendBuffer()
+    except ImportError as exc:
+        return {"skipped": str(exc)}
+    values = decode_home_data(HOME_FRAME)
+    stamp = iter(range(10**9))
+    append_rate = _rate(lambda: trends.append(next(stamp) * 0.1, values))
+    while len(trends) < trends.capacity:
+        trends.append(next(stamp) * 0.1, values)
+    end = trends.last_time
+    start = time.perf_counter()
+    for field in trends.fields:
+        trends.decimate(field, end - 86400, end, columns)
+    return {
+        "append_per_s": append_rate,
+        "points": len(trends),
+        "decimate_all_fields_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def bench_reassembly(mtu: int = 20) -> dict[str, Any]:
+    """Notification chunk reassembly over a stream of Home Data replies."""
+    stream = HOME_FRAME * 1000
+    chunks = [stream[i : i + mtu] for i in range(0, len(stream), mtu)]
+
+    def run() -> None:
+        framer = FrameReassembler()
+        for chunk in chunks:
+            framer.feed(chunk)
+
+    per_s = _rate(run)
+    return {
+        "frames_per_s": round(per_s * 1000, 1),
+        "megabytes_per_s": round(per_s * len(stream) / 1e6, 3),
+    }
+
+
+def bench_commands() -> dict[str, Any]:
+    """CRC and frame building cost."""
+    values = list(range(16))
+    return {
+        "crc16_43_bytes_per_s": _rate(lambda: crc16(HOME_FRAME)),
+        "read_holding_cached_per_s": _rate(lambda: read_holding(0x0101, 0x13)),
+        "write_multiple_16_per_s": _rate(lambda: write_multiple(0x0202, values)),
+    }
+
+
+async def _poll_latency(count: int, link_delay: float, mtu: int) -> list[float]:
+    device = SimulatedDevice(mtu=mtu)
+    manager = ConnectionManager(fake_client_factory(device, link_delay=link_delay))
+    client = ModbusClient(manager.get("SIM"))
+    loop = asyncio.get_running_loop()
+    latencies = []
+    try:
+        for _ in range(count):
+            start = loop.time()
+            decode_home_data(await client.request(COMMANDS["Read Home Data"]))
+            latencies.append(loop.time() - start)
+    finally:
+        await manager.close()
+    return latencies
+
+
+def bench_latency(count: int, link_delay: float, mtu: int) -> dict[str, Any]:
+    """Request to decoded sample latency against a simulated device."""
+    latencies = asyncio.run(_poll_latency(count, link_delay, mtu))
+    latencies.sort()
+    return {
+        "link_delay_s": link_delay,
+        "mtu": mtu,
+        "requests": count,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        "overhead_ms": round((statistics.fmean(latencies) - link_delay) * 1000, 3),
+    }
+
+
+# Simulated device behaviour per phase: register script and reply loss
+ADAPTIVE_PHASES: dict[str, tuple[Callable[[float], dict[int, int]], float]] = {
+    "steady": (lambda t: {}, 0.0),
+    # battery current ramps at 10 A/s, well above HOME_DATA_RATES
+    "moving": (lambda t: {0x0103: 3202 + int(t * 1000) % 5000}, 0.0),
+    "lossy": (lambda t: {}, 0.3),
+}
+
+
+async def _adaptive_phases(phase_s: float, link_delay: float) -> dict[str, Any]:
+    device = SimulatedDevice(seed=1)
+    manager = ConnectionManager(fake_client_factory(device, link_delay=link_delay))
+    client = ModbusClient(manager.get("SIM"))
+    adaptive = AdaptiveInterval(min_interval=0.02, max_interval=0.4)
+    home = PollBlock("home", COMMANDS["Read Home Data"], 0.02, decode_home_data, timeout=0.1)
+    poller = Poller(client, "SIM", [home], adaptive=adaptive)
+    loop = asyncio.get_running_loop()
+    result = {}
+    try:
+        for name, (script, loss) in ADAPTIVE_PHASES.items():
+            device.script, device.loss = script, loss
+            before = adaptive.summary()
+            intervals = []
+            end = loop.time() + phase_s
+            while loop.time() < end:
+                due = poller.due_blocks(loop.time())
+                if due:
+                    poller.deliver(await poller.poll_once(due), loop.time())
+                    intervals.append(adaptive.interval)
+                await asyncio.sleep(max(0.0, poller.next_due - loop.time()))
+            after = adaptive.summary()
+            result[name] = {
+                "cycles": len(intervals),
+                "mean_interval_s": round(statistics.fmean(intervals), 4),
+                "final_interval_s": after["interval"],
+                "penalty": after["penalty"],
+                **{k: after[k] - before[k] for k in ("speedups", "backoffs", "congested")},
+            }
+    finally:
+        await manager.close()
+    return result
+
+
+def bench_adaptive(phase_s: float = 1.0, link_delay: float = 0.0) -> dict[str, Any]:
+    """Poller(adaptive=...) against a device that is steady, then moving, then lossy."""
+    return asyncio.run(_adaptive_phases(phase_s, link_delay))
+
+
+def check_adaptive(phases: dict[str, Any]) -> list[str]:
+    """Return descriptions of phases where the interval policy misbehaved."""
+    steady, moving, lossy = phases["steady"], phases["moving"], phases["lossy"]
+    problems = []
+    if steady["final_interval_s"] <= steady["mean_interval_s"]:
+        problems.append(f"steady phase did not back off: {steady}")
+    if moving["mean_interval_s"] >= steady["mean_interval_s"] or not moving["speedups"]:
+        problems.append(f"moving phase did not poll faster than steady: {moving}")
+    if not lossy["congested"]:
+        problems.append(f"lossy phase did not slow down for link errors: {lossy}")
+    return problems
+
+
+def _wall_ms(argv: list[str], runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, check=True, stdout=subprocess.DEVNULL, cwd=HERE)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+def bench_startup(runs: int = 5) -> dict[str, Any]:
+    """Wall time of `cli.py decode` over a bare interpreter, and heavy imports."""
+    argv = [sys.executable, os.path.join(HERE, "cli.py"), "decode", HOME_FRAME.hex()]
+    bare_ms = _wall_ms([sys.executable, "-c", "pass"], runs)
+    cli_ms = _wall_ms(argv, runs)
+    return {
+        "python_ms": bare_ms,
+        "cli_decode_ms": cli_ms,
+        "overhead_ms": round(cli_ms - bare_ms, 3),
+        "heavy_modules": heavy_imports(argv[2:]),
+    }
+
+
+def check_startup(startup: dict[str, Any], budget_ms: float) -> list[str]:
+    """Return descriptions of startup budget violations."""
+    problems = [f"{m} imported by an offline subcommand" for m in startup["heavy_modules"]]
+    if startup["overhead_ms"] > budget_ms:
+        problems.append(f"cli decode starts in {startup['overhead_ms']} ms, budget {budget_ms}")
+    return problems
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Return descriptions of metrics worse than baseline by over tolerance."""
+    worse = []
+    for group, metrics in baseline["results"].items():
+        for name, old in metrics.items():
+            new = current["results"].get(group, {}).get(name)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            # rates regress downwards, times (ms) upwards
+            ratio = old / new if name.endswith("_per_s") and new else new / old if old else 1
+            if name.endswith(("_per_s", "_ms")) and ratio > 1 + tolerance:
+                worse.append(f"{group}.{name}: {old} -> {new}")
+    return worse
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--link-delay", type=float, default=0.0)
+    parser.add_argument("--mtu", type=int, default=20)
+    parser.add_argument("--adaptive-phase", type=float, default=1.0, help="seconds per phase")
+    parser.add_argument("--startup-budget", type=float, help="max cli decode overhead in ms")
+    args = parser.parse_args()
+
+    result = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": {
+            "decode": bench_decode(),
+            "jk_decode": bench_jk_decode(),
+            "reassembly": bench_reassembly(args.mtu),
+            "commands": bench_commands(),
+            "trends": bench_trends(),
+            "latency": bench_latency(args.requests, args.link_delay, args.mtu),
+            "adaptive": bench_adaptive(args.adaptive_phase, args.link_delay),
+            "startup": bench_startup(),
+        },
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    failed = False
+    for line in check_adaptive(result["results"]["adaptive"]):
+        print(f"ADAPTIVE {line}", file=sys.stderr)
+        failed = True
+    if args.startup_budget is not None:
+        for line in check_startup(result["results"]["startup"], args.startup_budget):
+            print(f"BUDGET {line}", file=sys.stderr)
+            failed = True
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            worse = compare(result, json.load(file), args.tolerance)
+        for line in worse:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        failed = failed or bool(worse)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
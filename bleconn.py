@@ -0,0 +1,232 @@
+"""Module to keep long-lived BLE connections to BMS/MPPT devices."""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Any, Final
+
+from gattcache import GattCache
+from stats import ANY, Stats
+
+CHARACTERISTIC_UUID: Final = "0000FFE1-0000-1000-8000-00805f9b34fb"
+
+NotifyCallback = Callable[[Any, bytearray], None]
+ClientFactory = Callable[..., Any]
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def bleak_client(address: str, **kwargs: Any) -> Any:
+    """Create a BleakClient, importing bleak only when a device is used."""
+    from bleak import BleakClient
+
+    return BleakClient(address, **kwargs)
+
+
+class BLEConnection:
+    """Shared connection to one device that reconnects with backoff."""
+
+    def __init__(
+        self,
+        address: str,
+        char_uuid: str = CHARACTERISTIC_UUID,
+        client_factory: ClientFactory = bleak_client,
+        connect_timeout: float = 10.0,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_attempts: int = 5,
+        gatt_cache: GattCache | None = None,
+        stats: Stats | None = None,
+    ) -> None:
+        """Initialize connection state; nothing is connected until needed.
+
+        With a gatt_cache the data handles are resolved once per device and
+        later connections only discover the data service. With stats the
+        connect times and retries are recorded. bleak discovers services
+        inside connect(), so connects limited to the cached data service are
+        timed as "connect_cached" and full ones as "connect"; the difference
+        is what discovery costs.
+        """
+        self.address: Final = address
+        self.char_uuid: Final = char_uuid
+        self._factory = client_factory
+        self._connect_timeout = connect_timeout
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._max_attempts = max_attempts
+        self._gatt = gatt_cache
+        self.stats = stats
+        self._notify_char: Any = char_uuid
+        self._write_char: Any = char_uuid
+        self.name: str | None = None  # advertised name, keys the GATT cache
+        self._client: Any = None
+        self._lock = asyncio.Lock()
+        self._callbacks: list[NotifyCallback] = []
+        self._reconnect_task: asyncio.Task | None = None
+        self._closing = False
+        self.connect_count: int = 0
+
+    @property
+    def is_connected(self) -> bool:
+        """Return True while the underlying client is connected."""
+        return self._client is not None and self._client.is_connected
+
+    def add_notify_callback(self, callback: NotifyCallback) -> None:
+        """Register a handler for notifications on the data characteristic."""
+        if callback not in self._callbacks:
+            self._callbacks.append(callback)
+
+    def remove_notify_callback(self, callback: NotifyCallback) -> None:
+        """Unregister a notification handler."""
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def _on_notify(self, sender: Any, data: bytearray) -> None:
+        for callback in tuple(self._callbacks):
+            try:
+                callback(sender, data)
+            except Exception:
+                _LOGGER.exception("%s: notification handler failed", self.address)
+
+    def _on_disconnect(self, client: Any) -> None:
+        if client is not self._client:
+            return
+        self._client = None
+        _LOGGER.debug("%s: disconnected", self.address)
+        if not self._closing and self._callbacks and self._reconnect_task is None:
+            # keep notifications flowing for passive listeners
+            self._reconnect_task = asyncio.get_running_loop().create_task(
+                self._reconnect()
+            )
+
+    async def _reconnect(self) -> None:
+        try:
+            await self.connect()
+        except ConnectionError:
+            _LOGGER.warning("%s: giving up reconnecting", self.address)
+        finally:
+            self._reconnect_task = None
+
+    async def connect(self) -> Any:
+        """Return the connected client, (re)connecting with backoff."""
+        async with self._lock:
+            if self.is_connected:
+                return self._client
+            self._closing = False
+            loop = asyncio.get_running_loop()
+            delay = self._min_backoff
+            for attempt in range(1, self._max_attempts + 1):
+                kwargs = {}
+                entry = self._gatt.get(self.address, self.name) if self._gatt else None
+                if entry is not None:
+                    kwargs["services"] = [entry.service_uuid]
+                client = self._factory(
+                    self.address, disconnected_callback=self._on_disconnect, **kwargs
+                )
+                try:
+                    started = loop.time()
+                    await asyncio.wait_for(client.connect(), self._connect_timeout)
+                    if self.stats is not None:
+                        timing = "connect_cached" if "services" in kwargs else "connect"
+                        self.stats.observe(self.address, ANY, timing, loop.time() - started)
+                    self._resolve(client)
+                    try:
+                        await client.start_notify(self._notify_char, self._on_notify)
+                    except Exception:
+                        self._forget_gatt()
+                        raise
+                except Exception as exc:  # bleak raises BleakError/OSError/Timeout
+                    _LOGGER.debug(
+                        "%s: connect attempt %d failed: %s", self.address, attempt, exc
+                    )
+                    await self._drop(client)
+                    if attempt == self._max_attempts:
+                        break
+                    if self.stats is not None:
+                        self.stats.count(self.address, ANY, "connect_retries")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self._max_backoff)
+                    continue
+                self._client = client
+                self.connect_count += 1
+                _LOGGER.debug("%s: connected", self.address)
+                return client
+            raise ConnectionError(f"Unable to connect to {self.address}")
+
+    def _resolve(self, client: Any) -> None:
+        if self._gatt is not None:
+            entry = self._gatt.resolve(self.address, client, self.name)
+            self._notify_char, self._write_char = entry.notify_handle, entry.write_handle
+
+    def _forget_gatt(self) -> None:
+        if self._gatt is not None:
+            self._gatt.invalidate(self.address)
+        self._notify_char = self._write_char = self.char_uuid
+
+    async def write(self, data: bytes, response: bool = False) -> None:
+        """Write to the data characteristic, reconnecting once on failure."""
+        client = await self.connect()
+        try:
+            await client.write_gatt_char(self._write_char, data, response=response)
+        except Exception as exc:
+            _LOGGER.debug("%s: write failed, reconnecting: %s", self.address, exc)
+            if self.stats is not None:
+                self.stats.count(self.address, ANY, "write_retries")
+            self._forget_gatt()
+            await self._drop(client)
+            client = await self.connect()
+            await client.write_gatt_char(self._write_char, data, response=response)
+
+    async def _drop(self, client: Any) -> None:
+        if client is self._client:
+            self._client = None
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        """Stop notifications and disconnect."""
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            if client.is_connected:
+                await client.stop_notify(self._notify_char)
+        finally:
+            await client.disconnect()
+
+
+class ConnectionManager:
+    """Keep exactly one BLEConnection per device address."""
+
+    def __init__(self, client_factory: ClientFactory = bleak_client, **kwargs: Any) -> None:
+        """Initialize the manager; kwargs are passed to every BLEConnection."""
+        self._factory = client_factory
+        self._kwargs = kwargs
+        self._connections: dict[str, BLEConnection] = {}
+
+    def get(self, address: str, name: str | None = None) -> BLEConnection:
+        """Return the shared connection for address, creating it on first use."""
+        conn = self._connections.get(address)
+        if conn is None:
+            conn = BLEConnection(
+                address, client_factory=self._factory, **self._kwargs
+            )
+            self._connections[address] = conn
+        if name:
+            conn.name = name
+        return conn
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._connections
+
+    async def close(self) -> None:
+        """Disconnect every managed device."""
+        conns = list(self._connections.values())
+        self._connections.clear()
+        await asyncio.gather(*(c.close() for c in conns), return_exceptions=True)
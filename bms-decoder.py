@@ -1,45 +1,45 @@
 import sys
-import asyncio
-import threading
-from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QTextEdit, QLineEdit
-from bleak import BleakScanner, BleakClient
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QLineEdit
+from asyncworker import AsyncWorker
+from bleconn import ConnectionManager
+from commands import BATTERY_TYPE_REG, COMMANDS, SYSTEM_VOLTAGE_REG
+from drivers import DriverRegistry
+from gattcache import GattCache
+from modbus import ModbusError, write_single
+from registers import HOME_DATA, decode_bms_response, decode_home_data
+from registry import DeviceRegistry
+from settings import SettingsEditor, SettingsError
+from transaction import ModbusClient
+from widgets import LogView, TelemetryPanel
 import struct
 
 # Global Variables
 BMS_MAC_ADDRESS = None  # Will be set after scanning
-SERVICE_UUID = "0000FFE0-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
-
-COMMANDS = {
-    "Read Home Data": "01 03 01 01 00 13 54 3B",
-    "Set System Voltage": "01 06 00 10",  # Placeholder
-    "Set Battery Type": "01 06 00 20"  # Placeholder
-}
-
-def decode_bms_response(hex_response):
-    """
-    Decodes a Modbus RTU response from the BMS device.
-    """
-    try:
-        response_bytes = bytes.fromhex(hex_response)
-        
-        if len(response_bytes) < 10:
-            return "Invalid response length"
-        
-        battery_voltage_raw = int.from_bytes(response_bytes[5:7], byteorder="big")  # Read 2 bytes
-        controller_temperature_raw = response_bytes[11]  # 33 -> Controller temp
-        battery_temperature_raw = response_bytes[12]  # 19 -> Battery temp
-        
-        return (f"Battery Voltage: {battery_voltage_raw} (Raw)\n"
-                f"Controller Temperature: {controller_temperature_raw} (Raw)\n"
-                f"Battery Temperature: {battery_temperature_raw} (Raw)")
-    except Exception as e:
-        return f"Error decoding response: {str(e)}"
 
 class BluetoothBMSGUI(QWidget):
+    log = pyqtSignal(str)
+    status = pyqtSignal(str)
+    values = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
+        # One loop and one connection per device shared by every button press
+        self.worker = AsyncWorker()
+        self.gatt = GattCache()
+        self.connections = ConnectionManager(gatt_cache=self.gatt)
+        self.clients = {}
+        self.editors = {}
+        # record every device some protocol driver recognizes, JK packs included
+        self.registry = DeviceRegistry(match=DriverRegistry(None).match_name)
         self.initUI()
+        # BLE work runs on the worker loop; widgets are only touched via signals
+        self.log.connect(self.response_area.append)
+        self.status.connect(self.device_label.setText)
+        self.values.connect(self.telemetry.update_values)
+        # Start on the last controller seen; a background scan keeps the list fresh
+        self.use_known_device()
+        self.worker.submit(self.registry.watch())
 
     def initUI(self):
         self.setWindowTitle("Bluetooth BMS Tool")
@@ -73,76 +73,154 @@ class BluetoothBMSGUI(QWidget):
         self.set_battery_button = QPushButton("Set Battery Type", self)
         self.set_battery_button.clicked.connect(self.set_battery_type)
         self.layout.addWidget(self.set_battery_button)
+
+        # Edits are staged locally and written together with one 0x10 request
+        self.read_settings_button = QPushButton("Read Settings", self)
+        self.read_settings_button.clicked.connect(self.read_settings)
+        self.layout.addWidget(self.read_settings_button)
+
+        self.apply_settings_button = QPushButton("Apply Settings", self)
+        self.apply_settings_button.clicked.connect(self.apply_settings)
+        self.layout.addWidget(self.apply_settings_button)
         
-        self.response_area = QTextEdit(self)
-        self.response_area.setReadOnly(True)
+        self.telemetry = TelemetryPanel([(name, HOME_DATA.units[name]) for name in HOME_DATA.names], self)
+        self.layout.addWidget(self.telemetry)
+
+        self.response_area = LogView(self)
         self.layout.addWidget(self.response_area)
 
         self.setLayout(self.layout)
 
+    def use_known_device(self):
+        global BMS_MAC_ADDRESS
+        known = self.registry.known()
+        if known:
+            BMS_MAC_ADDRESS = known[0].address
+            self.status.emit(f"Known Device: {known[0].name} ({BMS_MAC_ADDRESS})")
+
     def scan_devices(self):
-        scan_thread = threading.Thread(target=asyncio.run, args=(self.scan_devices_async(),))
-        scan_thread.start()
+        self.worker.submit(self.scan_devices_async())
 
     async def scan_devices_async(self):
         global BMS_MAC_ADDRESS
-        self.device_label.setText("Scanning...")
-        devices = await BleakScanner.discover()
-        for device in devices:
-            if device.name and ("BMS" in device.name or "MPPT" in device.name):
-                BMS_MAC_ADDRESS = device.address
-                self.device_label.setText(f"Selected Device: {BMS_MAC_ADDRESS}")
-                return
-        self.device_label.setText("No BMS found")
+        self.status.emit("Scanning...")
+        found = await self.registry.scan()
+        if not found:
+            self.status.emit("No BMS found")
+            return
+        BMS_MAC_ADDRESS = found[0].address
+        self.status.emit(f"Selected Device: {BMS_MAC_ADDRESS}")
 
     def send_command(self):
-        command_thread = threading.Thread(target=asyncio.run, args=(self.send_command_async(),))
-        command_thread.start()
-
-    async def send_command_async(self):
         if not BMS_MAC_ADDRESS:
             self.response_area.setText("No device selected. Scan first.")
             return
-        
-        command_hex = COMMANDS["Read Home Data"]
-        command_bytes = bytes.fromhex(command_hex)
-
-        async with BleakClient(BMS_MAC_ADDRESS) as client:
-            if await client.is_connected():
-                self.response_area.append(f"Connected to {BMS_MAC_ADDRESS}")
-                await client.start_notify(CHARACTERISTIC_UUID, self.notification_handler)  # Enable notifications
-                await client.write_gatt_char(CHARACTERISTIC_UUID, command_bytes)
-                self.response_area.append(f"Sent: {command_hex}")
-                await asyncio.sleep(5)
-                await client.stop_notify(CHARACTERISTIC_UUID)
-
-    async def notification_handler(self, sender, data):
-        hex_data = data.hex()
-        self.response_area.append(f"Received: {hex_data}")
-        decoded_response = decode_bms_response(hex_data)
-        self.response_area.append(decoded_response)
+        self.worker.submit(self.send_command_async())
+
+    async def send_command_async(self):
+        command_bytes = COMMANDS["Read Home Data"]
+        self.log.emit(f"Sent: {command_bytes.hex(' ')}")
+        try:
+            response = await self.device_client().request(command_bytes)
+        except (TimeoutError, ConnectionError, ModbusError) as e:
+            self.log.emit(f"No valid response: {e}")
+            return
+        self.show_response(response)
+
+    def device_client(self):
+        """Return the Modbus client sharing the selected device's connection."""
+        client = self.clients.get(BMS_MAC_ADDRESS)
+        if client is None:
+            client = ModbusClient(self.connections.get(BMS_MAC_ADDRESS))
+            self.clients[BMS_MAC_ADDRESS] = client
+        return client
+
+    def show_response(self, response):
+        self.log.emit(f"Received: {response.hex()}")
+        try:
+            self.values.emit(decode_home_data(response))
+        except ValueError as e:
+            self.log.emit(f"Error decoding response: {str(e)}")
 
     def set_system_voltage(self):
-        voltage = self.voltage_input.text()
-        command_hex = COMMANDS["Set System Voltage"] + voltage.zfill(4)
-        command_thread = threading.Thread(target=asyncio.run, args=(self.send_custom_command(command_hex),))
-        command_thread.start()
+        self.write_register(SYSTEM_VOLTAGE_REG, self.voltage_input.text())
 
     def set_battery_type(self):
-        battery_type = self.battery_type_input.text()
-        command_hex = COMMANDS["Set Battery Type"] + battery_type.zfill(4)
-        command_thread = threading.Thread(target=asyncio.run, args=(self.send_custom_command(command_hex),))
-        command_thread.start()
+        self.write_register(BATTERY_TYPE_REG, self.battery_type_input.text())
 
-    async def send_custom_command(self, command_hex):
+    def write_register(self, register, text):
         if not BMS_MAC_ADDRESS:
             self.response_area.setText("No device selected. Scan first.")
             return
-        command_bytes = bytes.fromhex(command_hex)
-        async with BleakClient(BMS_MAC_ADDRESS) as client:
-            if await client.is_connected():
-                self.response_area.append(f"Sending: {command_hex}")
-                await client.write_gatt_char(CHARACTERISTIC_UUID, command_bytes)
+        editor = self.settings_editor()
+        try:
+            value = int(text, 0)
+            if register in editor:
+                editor[register] = value
+                self.response_area.append(
+                    f"Staged 0x{register:04X} = {value}; press Apply Settings to write")
+                return
+            command_bytes = write_single(register, value)
+        except (ValueError, SettingsError) as e:
+            self.response_area.append(f"Invalid value {text!r}: {e}")
+            return
+        self.worker.submit(self.send_custom_command(command_bytes))
+
+    def settings_editor(self):
+        """Return the settings editor sharing the selected device's client."""
+        editor = self.editors.get(BMS_MAC_ADDRESS)
+        if editor is None:
+            editor = SettingsEditor(self.device_client())
+            self.editors[BMS_MAC_ADDRESS] = editor
+        return editor
+
+    def read_settings(self):
+        if not BMS_MAC_ADDRESS:
+            self.response_area.setText("No device selected. Scan first.")
+            return
+        self.worker.submit(self.read_settings_async(self.settings_editor()))
+
+    async def read_settings_async(self, editor):
+        try:
+            values = await editor.read()
+        except (TimeoutError, ConnectionError, ModbusError, SettingsError) as e:
+            self.log.emit(f"Reading settings failed: {e}")
+            return
+        self.log.emit("Settings: " + ", ".join(
+            f"0x{editor.register + i:04X}={v}" for i, v in enumerate(values)))
+
+    def apply_settings(self):
+        if not BMS_MAC_ADDRESS:
+            self.response_area.setText("No device selected. Scan first.")
+            return
+        self.worker.submit(self.apply_settings_async(self.settings_editor()))
+
+    async def apply_settings_async(self, editor):
+        try:
+            changes = await editor.apply()
+        except (TimeoutError, ConnectionError, ModbusError, SettingsError) as e:
+            self.log.emit(f"Settings not applied: {e}")
+            return
+        if not changes:
+            self.log.emit("No setting changed")
+            return
+        self.log.emit("Settings applied: " + ", ".join(
+            f"0x{r:04X} {old} -> {new}" for r, (old, new) in changes.items()))
+
+    async def send_custom_command(self, command_bytes):
+        self.log.emit(f"Sending: {command_bytes.hex(' ')}")
+        try:
+            response = await self.device_client().request(command_bytes)
+        except (TimeoutError, ConnectionError, ModbusError) as e:
+            self.log.emit(f"No valid response: {e}")
+            return
+        self.log.emit(f"Received: {response.hex()}")
+
+    def closeEvent(self, event):
+        self.worker.submit(self.connections.close()).result(5)
+        self.worker.stop()
+        self.registry.save()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,105 @@
+"""Module to record raw BLE notifications and replay them without hardware."""
+
+import struct
+import time
+from collections.abc import Callable, Iterator
+from typing import Any, BinaryIO, Final
+
+from framing import FrameReassembler
+from registers import HOME_DATA, decode_home_data
+
+MAGIC: Final = b"KCAP\x01"
+RECORD: Final = struct.Struct("<dHH")  # monotonic time, device index, length
+DEFINE_DEVICE: Final[int] = 0xFFFF  # record payload is a new device address
+
+
+class CaptureWriter:
+    """Append notification chunks with a monotonic timestamp to a file."""
+
+    def __init__(self, path: str) -> None:
+        """Open path for appending, writing the header if it is new."""
+        self._file: BinaryIO = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._devices: dict[str, int] = {}
+        self.chunks: int = 0
+
+    def record(self, address: str, data: bytes | bytearray) -> None:
+        """Store one chunk received from address."""
+        idx = self._devices.get(address)
+        if idx is None:
+            idx = self._devices[address] = len(self._devices)
+            name = address.encode()
+            self._file.write(RECORD.pack(time.monotonic(), DEFINE_DEVICE, len(name)) + name)
+        self._file.write(RECORD.pack(time.monotonic(), idx, len(data)) + data)
+        self.chunks += 1
+
+    def attach(self, conn: Any) -> None:
+        """Record every notification arriving on a BLEConnection."""
+        address = conn.address
+        conn.add_notify_callback(lambda sender, data: self.record(address, data))
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        self._file.close()
+
+
+def read_capture(path: str) -> Iterator[tuple[float, str, bytes]]:
+    """Yield (monotonic time, address, chunk) from a capture file."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a capture file")
+    devices: list[str] = []
+    pos, end = len(MAGIC), len(data)
+    while pos + RECORD.size <= end:
+        stamp, idx, size = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        chunk = data[pos : pos + size]
+        pos += size
+        if len(chunk) < size:
+            break  # truncated tail of an interrupted recording
+        if idx == DEFINE_DEVICE:
+            devices.append(chunk.decode())
+        else:
+            yield stamp, devices[idx], chunk
+
+
+async def replay(
+    path: str,
+    handler: Callable[[str, bytearray], Any],
+    realtime: bool = False,
+    speed: float = 1.0,
+) -> int:
+    """Feed captured chunks to handler(address, data); return the count.
+
+    With realtime the original spacing is kept (scaled by speed), otherwise
+    chunks are delivered as fast as the handler consumes them.
+    """
+    import asyncio  # only replay needs a loop; decoding stays import-light
+
+    loop = asyncio.get_running_loop()
+    count = 0
+    start = first = None
+    for stamp, address, chunk in read_capture(path):
+        if realtime:
+            if first is None:
+                first, start = stamp, loop.time()
+            delay = start + (stamp - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        handler(address, bytearray(chunk))
+        count += 1
+    return count
+
+
+def decode_capture(path: str) -> Iterator[tuple[float, str, dict[str, float]]]:
+    """Yield decoded Home Data replies found in a capture, per device."""
+    framers: dict[str, FrameReassembler] = {}
+    for stamp, address, chunk in read_capture(path):
+        framer = framers.get(address)
+        if framer is None:
+            framer = framers[address] = FrameReassembler()
+        for frame in framer.feed(chunk):
+            if len(frame) == HOME_DATA.frame_len and frame[1] == 0x03:
+                yield stamp, address, decode_home_data(frame)
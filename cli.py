@@ -0,0 +1,155 @@
+"""Command-line entry point; offline subcommands never import Qt, bleak or asyncio.
+
+    python cli.py decode "01 03 26 ..."       decode one reply frame (Modbus or JK)
+    python cli.py capture session.kcap        decoded Home Data of a capture, JSON lines
+    python cli.py command "Read Home Data"    frame of a named command, or --read/--write
+    python cli.py crc "01 03 01 01 00 13"     append the Modbus CRC
+    python cli.py read C8:47:80:53:44:85      one live Home Data read over BLE
+    python cli.py gui                         start the Qt tool
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Final
+
+HERE: Final = os.path.dirname(os.path.abspath(__file__))
+
+# Packages the offline subcommands must not load; importcheck.py checks this
+HEAVY_MODULES: Final = ("PyQt6", "bleak", "numpy", "asyncio")
+
+
+def _hex(text: str) -> bytes:
+    try:
+        return bytes.fromhex(text.replace(":", " "))
+    except ValueError as exc:
+        raise SystemExit(f"not a hex frame: {exc}") from None
+
+
+def cmd_decode(args: argparse.Namespace) -> int:
+    from drivers import DRIVERS
+
+    frame = _hex(" ".join(args.frame))
+    for driver in DRIVERS:
+        if driver.matches_frame(frame):
+            values = driver.decode(frame)
+            print(f"# {driver.name}")
+            for name, value in values.items():
+                unit = driver.units.get(name, "")
+                print(f"{name}: {round(value, 3) if isinstance(value, float) else value}{unit}")
+            return 0 if values else 1
+    print("no driver recognizes this frame (bad CRC or unknown header)", file=sys.stderr)
+    return 1
+
+
+def cmd_capture(args: argparse.Namespace) -> int:
+    from capture import decode_capture
+
+    for stamp, address, values in decode_capture(args.path):
+        if args.address is None or address == args.address:
+            record = {"t": round(stamp, 3), "address": address, **values}
+            print(json.dumps(record, separators=(",", ":")))
+    return 0
+
+
+def cmd_command(args: argparse.Namespace) -> int:
+    from commands import COMMANDS
+    from modbus import read_holding, write_single
+
+    if args.read is not None:
+        frame = read_holding(*args.read, unit=args.unit)
+    elif args.write is not None:
+        frame = write_single(*args.write, unit=args.unit)
+    elif args.name in COMMANDS:
+        frame = COMMANDS[args.name]
+    else:
+        if args.name:
+            print(f"unknown command {args.name!r}", file=sys.stderr)
+        for name, known in COMMANDS.items():
+            print(f"{name:<26} {known.hex(' ')}")
+        return 0 if not args.name else 1
+    print(frame.hex(" "))
+    return 0
+
+
+def cmd_crc(args: argparse.Namespace) -> int:
+    from modbus import append_crc
+
+    print(append_crc(_hex(" ".join(args.frame))).hex(" "))
+    return 0
+
+
+def cmd_read(args: argparse.Namespace) -> int:
+    import asyncio
+
+    import kickass
+    from stats import Stats
+
+    kickass.BMS_MAC_ADDRESS = args.address
+    stats = Stats() if args.stats else None
+    asyncio.run(kickass.send_command_async(stats))
+    if stats is not None:
+        print(stats.format())
+    return 0
+
+
+def cmd_gui(args: argparse.Namespace) -> int:
+    import runpy
+
+    script = "pythongui.py" if args.v1 else "pythonguiv2.py"
+    runpy.run_path(os.path.join(HERE, script), run_name="__main__")
+    return 0
+
+
+def _register(value: str) -> int:
+    return int(value, 0)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[2:]),
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("decode", help="decode one reply frame given as hex")
+    p.add_argument("frame", nargs="+")
+    p.set_defaults(func=cmd_decode)
+
+    p = sub.add_parser("capture", help="decode the Home Data replies in a capture file")
+    p.add_argument("path")
+    p.add_argument("--address", help="only this device")
+    p.set_defaults(func=cmd_capture)
+
+    p = sub.add_parser("command", help="print a command frame; no name lists them")
+    p.add_argument("name", nargs="?", default="")
+    p.add_argument("--read", nargs=2, type=_register, metavar=("REG", "COUNT"))
+    p.add_argument("--write", nargs=2, type=_register, metavar=("REG", "VALUE"))
+    p.add_argument("--unit", type=_register, default=1)
+    p.set_defaults(func=cmd_command)
+
+    p = sub.add_parser("crc", help="append the Modbus CRC to a hex frame")
+    p.add_argument("frame", nargs="+")
+    p.set_defaults(func=cmd_crc)
+
+    p = sub.add_parser("read", help="read Home Data once over BLE")
+    p.add_argument("address")
+    p.add_argument("--stats", action="store_true", help="print BLE timings")
+    p.set_defaults(func=cmd_read)
+
+    p = sub.add_parser("gui", help="start the Qt tool")
+    p.add_argument("--v1", action="store_true", help="the original single-window tool")
+    p.set_defaults(func=cmd_gui)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Module with the precomputed command frames of the MPPT/BMS controllers."""
+
+from typing import Final
+
+from modbus import build_frame, read_holding, write_single
+
+HOME_DATA_REG: Final[int] = 0x0101
+HOME_DATA_COUNT: Final[int] = 0x13
+OVERDATA_COUNT: Final[int] = 0x11
+SETTINGS_REG: Final[int] = 0x0202
+SETTINGS_COUNT: Final[int] = 0x10
+TODAY_DATA_REG: Final[int] = 0x0400
+TODAY_DATA_COUNT: Final[int] = 0x05
+MODE_SIZE_REG: Final[int] = 0x000B
+SYSTEM_VOLTAGE_REG: Final[int] = 0x0010  # placeholder, not confirmed on a device
+BATTERY_TYPE_REG: Final[int] = 0x0020  # placeholder, not confirmed on a device
+
+
+def is_controller_name(name: str | None) -> bool:
+    """Return True for advertised names of supported controllers."""
+    return bool(name) and ("BMS" in name or "MPPT" in name)
+
+
+COMMANDS: Final[dict[str, bytes]] = {
+    "Read Home Data": read_holding(HOME_DATA_REG, HOME_DATA_COUNT),
+    "CHART_TODAY": read_holding(TODAY_DATA_REG, TODAY_DATA_COUNT),
+    "NEW_CHART_TODAY": read_holding(TODAY_DATA_REG, TODAY_DATA_COUNT),
+    "TODAY_DATA": read_holding(TODAY_DATA_REG, TODAY_DATA_COUNT),
+    "Clear_historical_data": build_frame(1, 0x79, b"\xff\xff\xff\xff"),
+    "Restore_Factory_Settings": build_frame(1, 0x78, b"\xff\xff\xff\xff"),
+    "Read_SETTINGS": read_holding(SETTINGS_REG, SETTINGS_COUNT),
+    "Forced_CHECK": write_single(0x0121, 0x01FF),
+    "Forced_CHECK1_CLOSE": write_single(0x0120, 0x0000),
+    "Forced_CHECK1_OPEN": write_single(0x0120, 0x0001),
+    "Forced_CHECK3_CLOSE": write_single(0x0121, 0xFF00),
+    "Forced_CHECK3_OPEN": write_single(0x0121, 0xFF01),
+    "Forced_Load_Short": read_holding(0x0121, 1),
+    "MODE_SIZE": read_holding(MODE_SIZE_REG, 1),
+    "OVERDATA": read_holding(HOME_DATA_REG, OVERDATA_COUNT),
+    # 0x10 headers as the app sends them, without register data
+    "SETTING_RETURN": build_frame(1, 0x10, bytes.fromhex("02 00 00 15")),
+    "SETTING_RETURN2": build_frame(1, 0x10, bytes.fromhex("03 00 00 0C")),
+}
@@ -0,0 +1,332 @@
+"""Module choosing the protocol driver of a device by name or first response."""
+
+import json
+import logging
+import os
+import struct
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any, Final
+
+from commands import COMMANDS, is_controller_name
+from framing import ECHO_FUNCTIONS, FrameReassembler
+from modbus import EXCEPTION_FLAG, READ_HOLDING, check_crc, unpack_registers
+from registers import HOME_DATA, HOME_DATA_LEN, decode_home_data
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Driver(ABC):
+    """Command building, framing, decoding and polling of one device family.
+
+    client() and blocks() import the asyncio based modules lazily so that
+    offline decoding never loads them.
+    """
+
+    name: str = ""
+    units: dict[str, str] = {}
+
+    @abstractmethod
+    def matches_name(self, name: str | None) -> bool:
+        """Return True if an advertised name identifies this family."""
+
+    @abstractmethod
+    def matches_frame(self, data: bytes | bytearray | memoryview) -> bool:
+        """Return True if data, a complete frame from the device, is ours."""
+
+    @abstractmethod
+    def poll_request(self) -> bytes:
+        """Return the request answered with the live values."""
+
+    @abstractmethod
+    def framer(self) -> Any:
+        """Return a new object whose feed(chunk) returns complete frames."""
+
+    @abstractmethod
+    def decode(self, frame: bytes | bytearray | memoryview) -> dict[str, Any]:
+        """Return the values carried by one complete frame."""
+
+    @abstractmethod
+    def client(self, conn: Any) -> Any:
+        """Return a request/reply client (send, request, close) over conn."""
+
+    @abstractmethod
+    def blocks(self) -> list[Any]:
+        """Return the poller.PollBlock schedule of the device."""
+
+
+class ModbusDriver(Driver):
+    """Modbus RTU MPPT controllers and BMS answering the COMMANDS frames."""
+
+    name = "modbus"
+    units = dict(HOME_DATA.units)
+
+    def matches_name(self, name: str | None) -> bool:
+        return is_controller_name(name)
+
+    def matches_frame(self, data: bytes | bytearray | memoryview) -> bool:
+        if len(data) < 5 or not check_crc(data):
+            return False
+        function = data[1] & ~EXCEPTION_FLAG
+        if function == READ_HOLDING and not data[1] & EXCEPTION_FLAG:
+            return data[2] == len(data) - 5
+        return function == READ_HOLDING or function in ECHO_FUNCTIONS
+
+    def poll_request(self) -> bytes:
+        return COMMANDS["Read Home Data"]
+
+    def framer(self) -> FrameReassembler:
+        return FrameReassembler()
+
+    def decode(self, frame: bytes | bytearray | memoryview) -> dict[str, Any]:
+        if frame[1] == READ_HOLDING and len(frame) == HOME_DATA_LEN:
+            return decode_home_data(frame)
+        return {"registers": unpack_registers(frame)} if frame[1] == READ_HOLDING else {}
+
+    def client(self, conn: Any) -> Any:
+        from transaction import ModbusClient
+
+        return ModbusClient(conn)
+
+    def blocks(self) -> list[Any]:
+        from poller import default_blocks
+
+        return default_blocks()
+
+
+def crc_sum(frame: bytes | bytearray | memoryview) -> int:
+    """Return the JK checksum: the low byte of the sum of all bytes."""
+    return sum(frame) & 0xFF
+
+
+def _layout(fields: Sequence[tuple[str, int, str, float, str]]) -> struct.Struct:
+    """Compile fields sorted by offset into one little-endian struct."""
+    fmt, pos = "<", 0
+    for _, offset, code, _, _ in fields:
+        fmt += f"{offset - pos}x{code}"
+        pos = offset + struct.calcsize(code)
+    return struct.Struct(fmt)
+
+
+class JKFramer:
+    """Assemble JK notifications into INFO_LEN frames, as kickass-bms.py does."""
+
+    def __init__(self) -> None:
+        """Initialize an empty frame buffer."""
+        self._frame = bytearray(JKDriver.INFO_LEN)
+        self._len = 0
+        self.crc_errors: int = 0
+
+    def feed(self, chunk: bytes | bytearray | memoryview) -> list[memoryview]:
+        """Append a notification and return the frames it completed."""
+        frames: list[memoryview] = []
+        chunk = bytes(chunk)
+        while chunk:
+            if chunk.startswith(JKDriver.BT_MODULE_MSG):
+                chunk = chunk[len(JKDriver.BT_MODULE_MSG) :]
+                continue
+            if chunk.startswith(JKDriver.HEAD_RSP):
+                self._len = 0
+            elif not self._len:
+                break  # no frame header to attach to
+            take = min(len(chunk), JKDriver.INFO_LEN - self._len)
+            self._frame[self._len : self._len + take] = chunk[:take]
+            self._len += take
+            chunk = chunk[take:]
+            if self._len < JKDriver.INFO_LEN:
+                break
+            self._len = 0
+            if crc_sum(memoryview(self._frame)[:-1]) != self._frame[-1]:
+                self.crc_errors += 1
+                continue
+            frames.append(memoryview(bytes(self._frame)))
+        return frames
+
+
+class JKDriver(Driver):
+    """Jikong BMS streaming 300 byte frames (JK02_32S layout)."""
+
+    name = "jk"
+    # mirror of the BMS class constants in kickass-bms.py
+    HEAD_RSP: Final = bytes([0x01, 0x03, 0x00, 0x0A])
+    HEAD_CMD: Final = bytes([0x01, 0x03, 0x01, 0x01])
+    BT_MODULE_MSG: Final = bytes([0x41, 0x54, 0x0D, 0x0A])
+    TYPE_POS: Final[int] = 4
+    INFO_LEN: Final[int] = 300
+    CELL_INFO: Final[int] = 0x02
+    # name, frame offset, struct code, scale, unit
+    FIELDS: Final = (
+        ("voltage", 150, "I", 0.251, "V"),
+        ("current", 158, "i", 0.0147, "A"),
+        ("battery_level", 173, "B", 1, "%"),
+        ("cycle_charge", 174, "I", 0.1154, "Ah"),
+        ("temperature", 180, "H", 0.0078, "°C"),
+        ("cycles", 182, "I", 1, ""),
+    )
+    units = {name: unit for name, _, _, _, unit in FIELDS}
+    _STRUCT: Final = _layout(FIELDS)
+
+    def matches_name(self, name: str | None) -> bool:
+        return bool(name) and name.upper().startswith("JK")
+
+    def matches_frame(self, data: bytes | bytearray | memoryview) -> bool:
+        data = bytes(data)
+        if data.startswith(self.BT_MODULE_MSG):
+            data = data[len(self.BT_MODULE_MSG) :]
+        return data.startswith(self.HEAD_RSP)
+
+    def poll_request(self) -> bytes:
+        frame = bytes([*self.HEAD_CMD, 0x96, 0, *[0] * 13])
+        return frame + bytes([crc_sum(frame)])
+
+    def framer(self) -> JKFramer:
+        return JKFramer()
+
+    def is_cell_frame(self, frame: bytes | bytearray | memoryview) -> bool:
+        """Return True for the cell info frame carrying the live values."""
+        return len(frame) == self.INFO_LEN and frame[self.TYPE_POS] == self.CELL_INFO
+
+    def client(self, conn: Any) -> Any:
+        from transaction import StreamClient
+
+        return StreamClient(conn, self.framer(), self.is_cell_frame)
+
+    def blocks(self) -> list[Any]:
+        from poller import PollBlock
+
+        # the BMS streams cell frames once asked; one request per cycle is enough
+        return [PollBlock("cells", self.poll_request(), 5.0, self.decode, timeout=5.0)]
+
+    def decode(self, frame: bytes | bytearray | memoryview) -> dict[str, Any]:
+        if not self.is_cell_frame(frame):
+            return {}
+        return {
+            name: raw * scale if scale != 1 else raw
+            for (name, _, _, scale, _), raw in zip(self.FIELDS, self._STRUCT.unpack_from(frame))
+        }
+
+
+# JK names like "JK_BMS" also pass the Modbus name check, so JK goes first
+DRIVERS: Final[tuple[Driver, ...]] = (JKDriver(), ModbusDriver())
+
+
+class DriverRegistry:
+    """Driver chosen per address, persisted as JSON at path.
+
+    A device is identified once, by its advertised name or else by the
+    first notification it sends, and later connects reuse the answer while
+    the name stays the same.
+    """
+
+    def __init__(
+        self, path: str | None = "drivers.json", drivers: Sequence[Driver] = DRIVERS
+    ) -> None:
+        """Load the cached choices from path if it exists."""
+        self.path = path
+        self.drivers = tuple(drivers)
+        self._by_name = {d.name: d for d in self.drivers}
+        self._chosen: dict[str, tuple[str, str | None]] = {}  # address -> (driver, name)
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for address, (driver, name) in json.load(file).items():
+                    if driver in self._by_name:
+                        self._chosen[address] = (driver, name)
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(self._chosen, file, indent=1)
+        os.replace(tmp, self.path)
+
+    def named(self, name: str) -> Driver:
+        """Return the driver called name, e.g. from a config file."""
+        try:
+            return self._by_name[name]
+        except KeyError:
+            choices = ", ".join(sorted(self._by_name))
+            raise ValueError(f"unknown driver {name!r}, expected one of {choices}") from None
+
+    def match_name(self, name: str | None) -> bool:
+        """Return True if some driver recognizes name; a DeviceRegistry match."""
+        return self.for_name(name) is not None
+
+    def for_name(self, name: str | None) -> Driver | None:
+        """Return the first driver recognizing an advertised name."""
+        return next((d for d in self.drivers if d.matches_name(name)), None)
+
+    def for_frame(self, data: bytes | bytearray | memoryview) -> Driver | None:
+        """Return the first driver recognizing a device's first notification."""
+        return next((d for d in self.drivers if d.matches_frame(data)), None)
+
+    def get(self, address: str, name: str | None = None) -> Driver | None:
+        """Return the cached driver of address unless the device's name changed."""
+        chosen = self._chosen.get(address)
+        if chosen is None or (name and chosen[1] and name != chosen[1]):
+            return None
+        return self._by_name[chosen[0]]
+
+    def remember(self, address: str, driver: Driver, name: str | None = None) -> None:
+        """Cache driver as the choice for address."""
+        if self._chosen.get(address) != (driver.name, name):
+            self._chosen[address] = (driver.name, name)
+            self._save()
+
+    def forget(self, address: str) -> None:
+        """Drop the choice for address, e.g. after its frames stop decoding."""
+        if self._chosen.pop(address, None) is not None:
+            self._save()
+
+    def detect(
+        self,
+        address: str,
+        name: str | None = None,
+        frame: bytes | bytearray | memoryview | None = None,
+    ) -> Driver | None:
+        """Return the driver of a device from the cache, its name or a frame."""
+        driver = self.get(address, name)
+        if driver is None:
+            driver = self.for_name(name)
+            if driver is None and frame is not None:
+                driver = self.for_frame(frame)
+            if driver is not None:
+                self.remember(address, driver, name)
+        return driver
+
+    async def probe(
+        self, address: str, conn: Any, name: str | None = None, timeout: float = 2.0
+    ) -> Driver | None:
+        """Identify a connected device whose name told nothing.
+
+        Each driver's poll request is written in turn until some driver's
+        framer completes a frame it recognizes; that happens once per address.
+        """
+        driver = self.detect(address, name)
+        if driver is not None:
+            return driver
+        import asyncio  # kept off the import path of offline decoding
+
+        loop = asyncio.get_running_loop()
+        first: asyncio.Future = loop.create_future()
+        framers = [d.framer() for d in self.drivers]
+
+        def on_notify(_sender: Any, data: bytearray) -> None:
+            for framer in framers:
+                for frame in framer.feed(data):
+                    if not first.done() and self.for_frame(frame) is not None:
+                        first.set_result(bytes(frame))
+
+        conn.add_notify_callback(on_notify)
+        try:
+            for candidate in self.drivers:
+                await conn.write(candidate.poll_request())
+                try:
+                    frame = await asyncio.wait_for(asyncio.shield(first), timeout)
+                except TimeoutError:
+                    continue
+                return self.detect(address, name, frame)
+        finally:
+            conn.remove_notify_callback(on_notify)
+        _LOGGER.debug("%s: no driver recognized the device", address)
+        return None
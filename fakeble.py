@@ -0,0 +1,345 @@
+"""Module providing in-process stand-ins for bleak used without hardware."""
+
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from framing import FrameReassembler
+from modbus import (
+    READ_HOLDING,
+    WRITE_MULTIPLE,
+    WRITE_SINGLE,
+    append_crc,
+    check_crc,
+    unpack_registers,
+)
+
+Responder = Callable[[bytes], Iterable[bytes]]
+
+
+@dataclass(slots=True)
+class FakeCharacteristic:
+    """BleakGATTCharacteristic look-alike."""
+
+    uuid: str
+    handle: int
+    properties: list[str]
+
+
+@dataclass(slots=True)
+class FakeService:
+    """BleakGATTService look-alike."""
+
+    uuid: str
+    handle: int
+    characteristics: list[FakeCharacteristic]
+
+
+# Generic Access plus the FFE0 data service with the FFE1 characteristic
+DEFAULT_SERVICES = [
+    FakeService(
+        "00001800-0000-1000-8000-00805f9b34fb",
+        1,
+        [FakeCharacteristic("00002a00-0000-1000-8000-00805f9b34fb", 2, ["read"])],
+    ),
+    FakeService(
+        "0000ffe0-0000-1000-8000-00805f9b34fb",
+        16,
+        [
+            FakeCharacteristic(
+                "0000ffe1-0000-1000-8000-00805f9b34fb",
+                17,
+                ["read", "write-without-response", "write", "notify"],
+            )
+        ],
+    ),
+]
+
+# Home Data registers 0x0101..: level 100 %, 26.8 V, 32.02 A, 858 W, 51/25 °C
+HOME_DATA_REGISTERS = {
+    0x0101: 100,
+    0x0102: 268,
+    0x0103: 3202,
+    0x0104: 858,
+    0x0105: 0x3319,
+}
+
+
+class FakeBleakClient:
+    """Minimal BleakClient look-alike that answers writes via a responder."""
+
+    def __init__(
+        self,
+        address: str,
+        disconnected_callback: Callable[[Any], None] | None = None,
+        responder: Responder | None = None,
+        fail_connects: int = 0,
+        link_delay: float = 0.0,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the fake; responder maps a written frame to chunks.
+
+        Chunks are delivered link_delay seconds after the write.
+        """
+        self.address = address
+        # the services filter limits discovery, as BleakClient(services=...) does
+        self.service_filter = kwargs.get("services")
+        self.services = [
+            s
+            for s in DEFAULT_SERVICES
+            if self.service_filter is None or s.uuid in self.service_filter
+        ]
+        self._disconnected_callback = disconnected_callback
+        self._responder = responder
+        self._fail_connects = fail_connects
+        self._link_delay = link_delay
+        self._connected = False
+        self._notify: dict[str, Callable[[Any, bytearray], Any]] = {}
+        self.writes: list[bytes] = []
+
+    @property
+    def is_connected(self) -> bool:
+        """Return the simulated link state."""
+        return self._connected
+
+    async def connect(self, **kwargs: Any) -> bool:
+        """Connect, failing the first fail_connects attempts."""
+        await asyncio.sleep(0)
+        if self._fail_connects > 0:
+            self._fail_connects -= 1
+            raise OSError("simulated connect failure")
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        """Disconnect without invoking the disconnected callback."""
+        self._connected = False
+        self._notify.clear()
+        return True
+
+    async def start_notify(self, char: str, callback: Callable[[Any, bytearray], Any]) -> None:
+        """Register a notification callback."""
+        self._require_connected()
+        self._notify[char] = callback
+
+    async def stop_notify(self, char: str) -> None:
+        """Unregister a notification callback."""
+        self._notify.pop(char, None)
+
+    async def write_gatt_char(self, char: str, data: bytes, response: bool = False) -> None:
+        """Record the write and schedule the responder's chunks as notifications."""
+        self._require_connected()
+        self.writes.append(bytes(data))
+        if self._responder is None:
+            return
+        loop = asyncio.get_running_loop()
+        for chunk in self._responder(bytes(data)):
+            if self._link_delay:
+                loop.call_later(self._link_delay, self.notify, char, chunk)
+            else:
+                loop.call_soon(self.notify, char, chunk)
+
+    def notify(self, char: str, data: bytes) -> None:
+        """Deliver a notification as the device would."""
+        callback = self._notify.get(char)
+        if callback is not None:
+            callback(char, bytearray(data))
+
+    def simulate_disconnect(self) -> None:
+        """Drop the link as if the device went out of range."""
+        self._connected = False
+        self._notify.clear()
+        if self._disconnected_callback is not None:
+            self._disconnected_callback(self)
+
+    def _require_connected(self) -> None:
+        if not self._connected:
+            raise OSError("not connected")
+
+
+def fake_client_factory(
+    responder: Responder | None = None, fail_connects: int = 0, link_delay: float = 0.0
+) -> Callable[..., FakeBleakClient]:
+    """Return a ConnectionManager client factory that builds fakes.
+
+    The first fail_connects connection attempts across all built clients fail.
+    """
+    remaining = [fail_connects]
+
+    def factory(address: str, **kwargs: Any) -> FakeBleakClient:
+        fail = 1 if remaining[0] > 0 else 0
+        remaining[0] -= fail
+        return FakeBleakClient(
+            address, responder=responder, fail_connects=fail, link_delay=link_delay, **kwargs
+        )
+
+    return factory
+
+
+class SimulatedDevice:
+    """Modbus register bank answering COMMANDS frames like a controller.
+
+    Reads are served from recorded replies of the same size when available,
+    otherwise from the register bank; writes update the bank and are echoed.
+    Replies are split into mtu sized notification chunks.
+
+    script, given the seconds since the first request, returns registers to
+    change before each reply, so values can move over time. A request is
+    left unanswered with probability loss, as on a lossy link.
+    """
+
+    def __init__(
+        self,
+        registers: dict[int, int] | None = None,
+        mtu: int = 20,
+        unit: int = 1,
+        script: Callable[[float], dict[int, int]] | None = None,
+        loss: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize with canned Home Data unless registers are given."""
+        self.registers = dict(HOME_DATA_REGISTERS if registers is None else registers)
+        self.mtu = mtu
+        self.unit = unit
+        self.script = script
+        self.loss = loss
+        self.recorded: dict[int, deque[bytes]] = {}
+        self.requests: int = 0
+        self.dropped: int = 0
+        self._random = random.Random(seed)
+        self._started: float | None = None
+
+    @classmethod
+    def from_capture(
+        cls, path: str, address: str | None = None, **kwargs: Any
+    ) -> "SimulatedDevice":
+        """Build a device replaying the 0x03 replies found in a capture."""
+        from capture import read_capture
+
+        device = cls(**kwargs)
+        framer = FrameReassembler()
+        for _stamp, addr, chunk in read_capture(path):
+            if address is None or addr == address:
+                for frame in framer.feed(chunk):
+                    if frame[1] == READ_HOLDING:
+                        device.recorded.setdefault(frame[2], deque()).append(bytes(frame))
+        return device
+
+    def reply(self, request: bytes) -> bytes | None:
+        """Return the complete reply frame to request, or None to stay silent."""
+        if not check_crc(request) or request[0] != self.unit:
+            return None
+        if self.script is not None:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            self.registers.update(self.script(now - self._started))
+        if self.loss and self._random.random() < self.loss:
+            self.dropped += 1
+            return None
+        self.requests += 1
+        function = request[1]
+        if function == READ_HOLDING:
+            start, count = struct.unpack_from(">HH", request, 2)
+            recorded = self.recorded.get(2 * count)
+            if recorded:
+                recorded.rotate(-1)
+                return recorded[-1]
+            words = [self.registers.get(start + i, 0) for i in range(count)]
+            return append_crc(
+                struct.pack(f">BBB{count}H", self.unit, function, 2 * count, *words)
+            )
+        if function == WRITE_SINGLE:
+            register, value = struct.unpack_from(">HH", request, 2)
+            self.registers[register] = value
+            return request
+        if function == WRITE_MULTIPLE:
+            start, count = struct.unpack_from(">HH", request, 2)
+            # request[4:] starts two bytes before the byte count, like a 0x03 reply
+            for i, value in enumerate(unpack_registers(request[4:])):
+                self.registers[start + i] = value
+            return append_crc(request[:6])
+        return request  # vendor commands (0x78/0x79) are echoed
+
+    def __call__(self, request: bytes) -> list[bytes]:
+        """Responder interface for FakeBleakClient."""
+        frame = self.reply(request)
+        if frame is None:
+            return []
+        return [frame[i : i + self.mtu] for i in range(0, len(frame), self.mtu)]
+
+
+@dataclass(slots=True)
+class FakeDevice:
+    """BLEDevice look-alike."""
+
+    address: str
+    name: str | None
+    rssi: int = -60
+
+
+@dataclass(slots=True)
+class FakeAdvertisement:
+    """AdvertisementData look-alike."""
+
+    local_name: str | None
+    rssi: int
+
+
+class FakeBleakScanner:
+    """BleakScanner look-alike advertising the devices in FakeBleakScanner.devices.
+
+    Each device is reported advertise_interval seconds after the scan starts.
+    """
+
+    devices: list[FakeDevice] = []
+    advertise_interval: float = 0.01
+
+    def __init__(
+        self, detection_callback: Callable[[Any, Any], None] | None = None, **kwargs: Any
+    ) -> None:
+        """Initialize a scanner; kwargs such as scanning_mode are ignored."""
+        self._callback = detection_callback
+        self._task: asyncio.Task | None = None
+        self.discovered: dict[str, FakeDevice] = {}
+
+    async def _advertise(self) -> None:
+        while True:
+            if not self.devices:
+                await asyncio.sleep(self.advertise_interval)  # still yield to the loop
+            for device in list(self.devices):
+                await asyncio.sleep(self.advertise_interval)
+                self.discovered[device.address] = device
+                if self._callback is not None:
+                    self._callback(device, FakeAdvertisement(device.name, device.rssi))
+
+    async def start(self) -> None:
+        """Begin reporting advertisements."""
+        self._task = asyncio.get_running_loop().create_task(self._advertise())
+
+    async def stop(self) -> None:
+        """Stop reporting advertisements."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def __aenter__(self) -> "FakeBleakScanner":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.stop()
+
+    @classmethod
+    async def discover(cls, timeout: float = 5.0, **kwargs: Any) -> list[FakeDevice]:
+        """Scan for timeout seconds and return every device seen."""
+        scanner = cls(**kwargs)
+        await scanner.start()
+        await asyncio.sleep(timeout)
+        await scanner.stop()
+        return list(scanner.discovered.values())
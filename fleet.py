@@ -0,0 +1,249 @@
+"""Module to poll many BMS/MPPT devices concurrently from one event loop."""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from adaptive import AdaptiveInterval
+from bleconn import BLEConnection, ConnectionManager
+from commands import is_controller_name
+from drivers import Driver, DriverRegistry, ModbusDriver
+from modbus import ModbusError
+from poller import PollBlock, Poller, Sample, default_blocks
+from registry import DeviceRegistry
+from transaction import ModbusClient
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class DeviceState:
+    """Per-device connection, schedule and health."""
+
+    address: str
+    name: str
+    conn: BLEConnection
+    client: Any  # ModbusClient, or the driver's client
+    poller: Poller
+    driver: Driver | None = None
+    failures: int = 0
+    connect_errors: int = 0
+    empty_samples: int = 0  # consecutive cycles that decoded nothing
+    last_error: str = ""
+    busy_time: float = 0.0
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    def summary(self) -> dict[str, Any]:
+        """Return throughput and error counters for display."""
+        stats = self.poller.stats
+        return {
+            "name": self.name,
+            "samples": stats.samples,
+            "rate": round(stats.rate, 3),
+            "errors": stats.errors + self.connect_errors,
+            "missed_deadlines": stats.missed_deadlines,
+            "interval": self.poller.adaptive.interval if self.poller.adaptive else 0.0,
+            "crc_errors": self.client.crc_errors,
+            "busy_time": round(self.busy_time, 3),
+            "last_error": self.last_error,
+        }
+
+
+class Fleet:
+    """Track every matching device and poll them under a shared slot limit.
+
+    A slot is held only for one poll cycle and is bounded by slot_timeout,
+    so an unresponsive device cannot hold the adapter away from the rest.
+    With more devices than slots, links are closed after each cycle.
+    """
+
+    def __init__(
+        self,
+        connections: ConnectionManager | None = None,
+        max_concurrent: int = 3,
+        slot_timeout: float = 5.0,
+        max_backoff: float = 60.0,
+        blocks: Callable[[], list[PollBlock]] = default_blocks,
+        on_sample: Callable[[Sample], None] | None = None,
+        adaptive: Callable[[], AdaptiveInterval] | None = None,
+        drivers: DriverRegistry | None = None,
+        forget_after: int = 5,
+    ) -> None:
+        """Initialize an empty fleet; adaptive makes each device's interval policy.
+
+        With drivers, each device is polled through its own protocol driver:
+        known from the registry or the advertised name, otherwise probed on
+        the first connect. A cached driver is forgotten, and the device
+        identified again, after forget_after cycles in a row decoded nothing.
+        blocks is the schedule of Modbus devices.
+        """
+        self.connections = connections or ConnectionManager(max_attempts=1)
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._slot_timeout = slot_timeout
+        self._max_backoff = max_backoff
+        self._blocks = blocks
+        self._on_sample = on_sample
+        self._adaptive = adaptive
+        self.drivers = drivers
+        self._forget_after = forget_after
+        self.devices: dict[str, DeviceState] = {}
+        self._running = False
+
+    def add(self, address: str, name: str = "", driver: Driver | None = None) -> DeviceState:
+        """Track a device, starting to poll it if the fleet is running."""
+        dev = self.devices.get(address)
+        if dev is not None:
+            return dev
+        if driver is None and self.drivers is not None:
+            driver = self.drivers.detect(address, name or None)
+        conn = self.connections.get(address)
+        client, poller = self._poller(conn, address, driver)
+        dev = DeviceState(address, name, conn, client, poller, driver)
+        self.devices[address] = dev
+        if self._running:
+            dev.task = asyncio.get_running_loop().create_task(self._run_device(dev))
+        return dev
+
+    def _poller(
+        self, conn: BLEConnection, address: str, driver: Driver | None
+    ) -> tuple[Any, Poller]:
+        if driver is None or isinstance(driver, ModbusDriver):
+            client, blocks = ModbusClient(conn), self._blocks()
+        else:
+            client, blocks = driver.client(conn), driver.blocks()
+        poller = Poller(
+            client,
+            address,
+            blocks,
+            self._on_sample,
+            adaptive=self._adaptive() if self._adaptive is not None else None,
+        )
+        return client, poller
+
+    async def _identify(self, dev: DeviceState) -> None:
+        """Probe a connected device nothing identified yet and switch its driver."""
+        drivers = self.drivers.drivers
+        driver = await self.drivers.probe(
+            dev.address, dev.conn, dev.name or None, self._slot_timeout / (len(drivers) + 1)
+        )
+        if driver is None:
+            raise ConnectionError("no driver recognized the device")
+        _LOGGER.info("%s: identified as %s", dev.address, driver.name)
+        dev.client.close()
+        dev.client, dev.poller = self._poller(dev.conn, dev.address, driver)
+        dev.driver = driver
+
+    def _forget_driver(self, dev: DeviceState) -> None:
+        """Drop the cached driver of a device whose replies it cannot decode."""
+        if self.drivers.get(dev.address, dev.name or None) is not dev.driver:
+            return  # set by the caller, not detected; keep it
+        _LOGGER.info("%s: %s decodes nothing, identifying again", dev.address, dev.driver.name)
+        self.drivers.forget(dev.address)
+        dev.driver = None
+        dev.empty_samples = 0
+
+    async def discover(self, timeout: float = 5.0, scanner: Any = None) -> list[DeviceState]:
+        """Scan once and track every device with a controller name."""
+        if scanner is None:
+            from bleak import BleakScanner as scanner
+        found = await scanner.discover(timeout=timeout)
+        if self.drivers is None:
+            return [self.add(d.address, d.name) for d in found if is_controller_name(d.name)]
+        return [
+            self.add(d.address, d.name, driver)
+            for d in found
+            if (driver := self.drivers.detect(d.address, d.name)) is not None
+        ]
+
+    def add_known(
+        self, registry: DeviceRegistry, max_age: float | None = None
+    ) -> list[DeviceState]:
+        """Track every device in registry without scanning."""
+        return [self.add(d.address, d.name or "") for d in registry.known(max_age)]
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Return per-device counters keyed by address."""
+        return {address: dev.summary() for address, dev in self.devices.items()}
+
+    async def run(self) -> None:
+        """Poll all devices until cancelled."""
+        loop = asyncio.get_running_loop()
+        self._running = True
+        for dev in self.devices.values():
+            dev.task = loop.create_task(self._run_device(dev))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._running = False
+            tasks = [d.task for d in self.devices.values() if d.task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.connections.close()
+
+    async def _run_device(self, dev: DeviceState) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = dev.poller.due_blocks(loop.time())
+            if due:
+                await self._poll_in_slot(dev, due)
+            delay = dev.poller.next_due - loop.time()
+            if dev.failures:
+                delay = max(delay, min(2.0**dev.failures, self._max_backoff))
+            await asyncio.sleep(max(0.0, delay))
+
+    async def _poll_in_slot(self, dev: DeviceState, due: list[PollBlock]) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            started = loop.time()
+            try:
+                sample = await asyncio.wait_for(
+                    self._poll(dev, due), self._slot_timeout
+                )
+            except (TimeoutError, ConnectionError, ModbusError) as exc:
+                dev.failures += 1
+                dev.last_error = str(exc) or type(exc).__name__
+                _LOGGER.debug("%s: poll failed: %s", dev.address, dev.last_error)
+                sample = None
+            except Exception as exc:  # e.g. BleakError or OSError from the adapter
+                # counted and backed off like a failed connect, never ending the task
+                dev.failures += 1
+                dev.connect_errors += 1
+                dev.last_error = f"{type(exc).__name__}: {exc}"
+                _LOGGER.warning("%s: poll failed: %s", dev.address, dev.last_error)
+                sample = None
+            finally:
+                dev.busy_time += loop.time() - started
+                if len(self.devices) > self.max_concurrent:
+                    # free the adapter connection for the next device in line
+                    await dev.conn.close()
+        if sample is not None:
+            dev.poller.deliver(sample, loop.time())
+
+    async def _poll(self, dev: DeviceState, due: list[PollBlock]) -> Sample:
+        try:
+            await dev.conn.connect()
+        except ConnectionError:
+            dev.connect_errors += 1
+            raise
+        if dev.driver is None and self.drivers is not None:
+            await self._identify(dev)
+            due = dev.poller.due_blocks(asyncio.get_running_loop().time())
+        sample = await dev.poller.poll_once(due)
+        if sample.values:
+            dev.failures = 0
+            dev.empty_samples = 0
+        else:
+            dev.failures += 1
+            dev.empty_samples += 1
+            dev.last_error = "no reply"
+            if (
+                self.drivers is not None
+                and dev.driver is not None
+                and dev.empty_samples >= self._forget_after
+            ):
+                self._forget_driver(dev)
+        return sample
@@ -0,0 +1,104 @@
+"""Module to reassemble Modbus RTU frames from fragmented BLE notifications."""
+
+from collections.abc import Iterable
+from typing import Final
+
+from modbus import CRC_LEN, EXCEPTION_FLAG, HEADER_LEN, READ_HOLDING, crc16
+
+# function codes answered with a fixed 8 byte echo (0x78/0x79 are vendor commands)
+ECHO_FUNCTIONS: Final = frozenset({0x06, 0x10, 0x78, 0x79})
+EXCEPTION_LEN: Final[int] = 5
+ECHO_LEN: Final[int] = 8
+
+
+class FrameReassembler:
+    """Incremental frame splitter over a preallocated buffer.
+
+    feed() returns memoryview slices of the internal buffer; they are only
+    valid until the next call to feed() and must be copied to be kept.
+    """
+
+    def __init__(self, capacity: int = 1024, addresses: Iterable[int] = (1,)) -> None:
+        """Initialize an empty buffer of capacity bytes."""
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self._addresses = frozenset(addresses)
+        self.frames: int = 0
+        self.crc_errors: int = 0
+        self.dropped: int = 0
+
+    def __len__(self) -> int:
+        """Return the number of buffered bytes not yet framed."""
+        return self._end - self._start
+
+    def reset(self) -> None:
+        """Discard any partial frame, e.g. after a reconnect."""
+        self.dropped += self._end - self._start
+        self._start = self._end = 0
+
+    def feed(self, chunk: bytes | bytearray | memoryview) -> list[memoryview]:
+        """Append a notification chunk and return all completed frames."""
+        size = len(chunk)
+        capacity = len(self._buf)
+        if self._end + size > capacity:
+            pending = self._end - self._start
+            if pending + size > capacity:
+                # nothing framed in a whole buffer: keep only the newest bytes
+                keep = max(0, capacity - size)
+                self.dropped += pending - keep
+                self._start = self._end - keep
+                pending = keep
+                if size > capacity:
+                    self.dropped += size - capacity
+                    chunk = chunk[size - capacity :]
+                    size = capacity
+            self._buf[:pending] = bytes(self._view[self._start : self._end])
+            self._start, self._end = 0, pending
+        self._buf[self._end : self._end + size] = chunk
+        self._end += size
+        return self._split()
+
+    def _split(self) -> list[memoryview]:
+        buf, view = self._buf, self._view
+        start, end = self._start, self._end
+        frames: list[memoryview] = []
+        while end - start >= 2:
+            function = buf[start + 1]
+            if buf[start] not in self._addresses:
+                length = 0
+            elif function == READ_HOLDING:
+                if end - start < HEADER_LEN:
+                    break
+                count = buf[start + 2]
+                length = 0 if count == 0 or count & 1 else HEADER_LEN + count + CRC_LEN
+            elif function in ECHO_FUNCTIONS:
+                length = ECHO_LEN
+            elif function & EXCEPTION_FLAG and (
+                function ^ EXCEPTION_FLAG == READ_HOLDING
+                or function ^ EXCEPTION_FLAG in ECHO_FUNCTIONS
+            ):
+                length = EXCEPTION_LEN
+            else:
+                length = 0
+            if not length:
+                # not a plausible header here, resync one byte further on
+                self.dropped += 1
+                start += 1
+                continue
+            if end - start < length:
+                break
+            body = start + length - CRC_LEN
+            if crc16(view[start:body]) != buf[body] | buf[body + 1] << 8:
+                self.crc_errors += 1
+                self.dropped += 1
+                start += 1
+                continue
+            frames.append(view[start : start + length])
+            start += length
+        if start == end:
+            start = end = 0
+        self._start, self._end = start, end
+        self.frames += len(frames)
+        return frames
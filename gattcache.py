@@ -0,0 +1,95 @@
+"""Module caching each device's GATT table and data characteristic handles."""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Final
+
+DATA_SERVICE_UUID: Final = "0000ffe0-0000-1000-8000-00805f9b34fb"
+DATA_CHAR_UUID: Final = "0000ffe1-0000-1000-8000-00805f9b34fb"
+
+
+@dataclass(slots=True)
+class GattEntry:
+    """Discovered services of one device and its resolved data handles."""
+
+    name: str | None
+    service_uuid: str
+    notify_handle: int
+    write_handle: int
+    # service uuid -> [(char uuid, handle, properties)]
+    services: dict[str, list[tuple[str, int, list[str]]]]
+
+    def describe(self) -> str:
+        """Return the service table as printable lines."""
+        lines = []
+        for service, chars in self.services.items():
+            lines.append(f"Service: {service}")
+            lines.extend(f"  Characteristic: {u} (0x{h:04x}) - {p}" for u, h, p in chars)
+        return "\n".join(lines)
+
+
+class GattCache:
+    """GATT tables per address, persisted as JSON at path.
+
+    An entry is reused while the advertised name matches, and is dropped
+    only when writing or subscribing through its handles fails.
+    """
+
+    def __init__(self, path: str = "gatt.json") -> None:
+        """Load the cache from path if it exists."""
+        self.path = path
+        self._entries: dict[str, GattEntry] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for address, entry in json.load(file).items():
+                    entry["services"] = {
+                        s: [tuple(c) for c in chars] for s, chars in entry["services"].items()
+                    }
+                    self._entries[address] = GattEntry(**entry)
+
+    def _save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump({a: asdict(e) for a, e in self._entries.items()}, file, indent=1)
+        os.replace(tmp, self.path)
+
+    def get(self, address: str, name: str | None = None) -> GattEntry | None:
+        """Return the entry for address unless the device's name changed."""
+        entry = self._entries.get(address)
+        if entry is None or (name and entry.name and name != entry.name):
+            return None
+        return entry
+
+    def resolve(self, address: str, client: Any, name: str | None = None) -> GattEntry:
+        """Return the cached entry, or build one from a connected client."""
+        entry = self.get(address, name)
+        if entry is not None:
+            return entry
+        services = {
+            s.uuid.lower(): [
+                (c.uuid.lower(), c.handle, list(c.properties)) for c in s.characteristics
+            ]
+            for s in client.services
+        }
+        chars = services.get(DATA_SERVICE_UUID, [])
+        # FFE1 carries both directions; otherwise take the first capable ones
+        chars = sorted(chars, key=lambda c: c[0] != DATA_CHAR_UUID)
+        notify = next((h for _, h, p in chars if "notify" in p), None)
+        write = next(
+            (h for _, h, p in chars if {"write", "write-without-response"} & set(p)), None
+        )
+        if notify is None or write is None:
+            raise ConnectionError(f"{address} has no usable {DATA_SERVICE_UUID} service")
+        entry = GattEntry(name, DATA_SERVICE_UUID, notify, write, services)
+        self._entries[address] = entry
+        self._save()
+        return entry
+
+    def invalidate(self, address: str) -> None:
+        """Forget address so the next connection discovers it again."""
+        if self._entries.pop(address, None) is not None:
+            self._save()
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._entries
@@ -0,0 +1,138 @@
+"""Module to download the controllers' daily history incrementally."""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from commands import TODAY_DATA_COUNT, TODAY_DATA_REG
+from modbus import MAX_READ_COUNT, read_holding, unpack_registers
+from transaction import ModbusClient
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class HistorySource:
+    """Records of record_size registers, newest (today) at register."""
+
+    name: str
+    register: int
+    record_size: int
+    max_records: int
+
+
+# TODAY_DATA is record 0; older days follow it. The depth is not confirmed
+# on a device. CHART_TODAY and NEW_CHART_TODAY read the same registers.
+DAILY = HistorySource("daily", TODAY_DATA_REG, TODAY_DATA_COUNT, 30)
+
+
+class HistoryCache:
+    """One JSON file per device holding records by source and date."""
+
+    def __init__(self, path: str = "history") -> None:
+        """Use the directory at path, creating it if needed."""
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, address: str) -> str:
+        return os.path.join(self.path, address.replace(":", "").replace("/", "_") + ".json")
+
+    def load(self, address: str) -> dict[str, Any]:
+        """Return {"records": {source: {date: registers}}, "complete": {source: date}}."""
+        try:
+            with open(self._file(address), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"records": {}, "complete": {}}
+
+    def save(self, address: str, data: dict[str, Any]) -> None:
+        """Replace the cached data of address."""
+        tmp = self._file(address) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp, self._file(address))
+
+    def records(self, address: str, source: HistorySource = DAILY) -> dict[str, list[int]]:
+        """Return the cached records of one source by ISO date."""
+        return self.load(address)["records"].get(source.name, {})
+
+
+class HistoryDownloader:
+    """Fetch the records not yet cached, several reads in flight at once."""
+
+    def __init__(
+        self,
+        client: ModbusClient,
+        address: str,
+        cache: HistoryCache,
+        sources: Sequence[HistorySource] = (DAILY,),
+        pipeline_depth: int = 4,
+    ) -> None:
+        """Initialize for one device's client."""
+        self._client = client
+        self.address = address
+        self._cache = cache
+        self.sources = sources
+        self._depth = max(1, pipeline_depth)
+
+    @staticmethod
+    def missing(source: HistorySource, complete: str | None, today: datetime.date) -> int:
+        """Return how many records back from today need fetching.
+
+        Today's record is always refetched since it is still growing.
+        """
+        if complete is None:
+            return source.max_records
+        days = (today - datetime.date.fromisoformat(complete)).days
+        return max(1, min(days + 1, source.max_records))
+
+    async def download(self, today: datetime.date | None = None) -> dict[str, int]:
+        """Fetch new records of every source; return how many were read.
+
+        Records read before a failure are kept; the failure is re-raised and
+        the next call fetches the same range again.
+        """
+        today = today or datetime.date.today()
+        data = self._cache.load(self.address)
+        counts = {}
+        try:
+            for source in self.sources:
+                stored = data["records"].setdefault(source.name, {})
+                count = self.missing(source, data["complete"].get(source.name), today)
+                counts[source.name] = 0
+                async for idx, registers in self._read(source, count):
+                    stored[(today - datetime.timedelta(days=idx)).isoformat()] = registers
+                    counts[source.name] += 1
+                _LOGGER.debug("%s: %d %s records", self.address, counts[source.name], source.name)
+                data["complete"][source.name] = today.isoformat()
+        finally:
+            self._cache.save(self.address, data)
+        return counts
+
+    async def _read(
+        self, source: HistorySource, count: int
+    ) -> AsyncIterator[tuple[int, list[int]]]:
+        per_read = max(1, MAX_READ_COUNT // source.record_size)
+        spans = [(i, min(per_read, count - i)) for i in range(0, count, per_read)]
+        for pos in range(0, len(spans), self._depth):
+            batch = spans[pos : pos + self._depth]
+            futures = [
+                await self._client.send(
+                    read_holding(source.register + i * source.record_size, n * source.record_size)
+                )
+                for i, n in batch
+            ]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            for (first, n), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    raise result
+                values = unpack_registers(result)
+                for k in range(n):
+                    yield first + k, list(
+                        values[k * source.record_size : (k + 1) * source.record_size]
+                    )
@@ -0,0 +1,50 @@
+"""Check that the offline CLI subcommands import none of cli.HEAVY_MODULES.
+
+Run ``python importcheck.py``; it needs nothing beyond the standard library,
+prints the heavy modules each subcommand loaded and exits 1 if there are any.
+bench.py --startup-budget applies the same check alongside its timings.
+"""
+
+import os
+import subprocess
+import sys
+from typing import Final
+
+from cli import HEAVY_MODULES
+
+HERE: Final = os.path.dirname(os.path.abspath(__file__))
+
+# A Home Data reply, as the simulated device in fakeble.py answers it
+HOME_REPLY: Final = (
+    "01 03 26 00 64 01 0c 0c 82 03 5a 33 19 00 00 00 00 00 00 00 00 00 00"
+    " 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 cf 9d"
+)
+OFFLINE_COMMANDS: Final = (
+    ("decode", HOME_REPLY),
+    ("command", "Read Home Data"),
+    ("crc", "01 03 01 01 00 13"),
+)
+
+
+def heavy_imports(args: list[str]) -> list[str]:
+    """Return the HEAVY_MODULES packages loaded by `cli.py *args`, sorted."""
+    trace = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(HERE, "cli.py"), *args],
+        check=True, capture_output=True, text=True, cwd=HERE,
+    ).stderr
+    # "import time: self | cumulative | name", nesting shown by indentation
+    loaded = {line.rsplit("|", 1)[1].strip() for line in trace.splitlines() if "|" in line}
+    return sorted(m for m in loaded if m.split(".")[0] in HEAVY_MODULES)
+
+
+def main() -> int:
+    failed = False
+    for args in OFFLINE_COMMANDS:
+        heavy = sorted({m.split(".")[0] for m in heavy_imports(list(args))})
+        print(f"{args[0]}: {'imports ' + ', '.join(heavy) if heavy else 'ok'}")
+        failed = failed or bool(heavy)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
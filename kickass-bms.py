@@ -1,7 +1,11 @@
 """Module to support Jikong Smart BMS."""
 
 import asyncio
+import struct
+import sys
+import time
 from collections.abc import Callable
+from functools import cache
 from typing import Final
 from bleak.backends.characteristic import BleakGATTCharacteristic
 from bleak.backends.device import BLEDevice
@@ -25,6 +29,9 @@ from custom_components.bms_ble.const import (
 )
 from .basebms import BaseBMS, BMSsample, crc_sum
 
+# memoryview.cast reads native order; JK frames are little-endian
+_NATIVE_LE: Final[bool] = sys.byteorder == "little"
+
 class BMS(BaseBMS):
     """Jikong Smart BMS class implementation with real-time data retrieval."""
 
@@ -45,26 +52,136 @@ class BMS(BaseBMS):
         ]
     )
     
-    def __init__(self, ble_device: BLEDevice, reconnect: bool = False) -> None:
-        """Initialize private BMS members."""
+    # Cells start after the 6-byte frame header; two temperature probes follow
+    # the protocol offset like the other fields.
+    _CELL_POS: Final[int] = 6
+    _TEMP_POS: Final[int] = 162
+    _TEMP_SENSORS: Final[int] = 2
+    _CELL_INFO: Final[int] = 0x02  # frame types, byte TYPE_POS
+    _DEVICE_INFO: Final[int] = 0x03
+    _MAX_AGE: Final[float] = 5.0  # seconds a streamed cell frame stays fresh
+    # device info frame: (key, start, end) of NUL-padded ASCII strings
+    _INFO_FIELDS: Final = (
+        ("model", 6, 22),
+        ("hw_version", 22, 30),
+        ("sw_version", 30, 38),
+        ("name", 46, 62),
+    )
+    _FORMATS: Final[dict[tuple[int, bool], str]] = {
+        (1, False): "B",
+        (1, True): "b",
+        (2, False): "H",
+        (2, True): "h",
+        (4, False): "I",
+        (4, True): "i",
+    }
+
+    def __init__(
+        self, ble_device: BLEDevice, reconnect: bool = False, reuse_sample: bool = False
+    ) -> None:
+        """Initialize private BMS members.
+
+        With reuse_sample every update refills the same sample dict, so
+        callers must copy it if they keep older readings.
+        """
         super().__init__(__name__, ble_device, reconnect)
-        self._data_final: bytearray = bytearray()
+        self._data_final: bytearray = bytearray(BMS.INFO_LEN)
+        self._data_time: float = 0.0
+        self._frame: bytearray = bytearray(BMS.INFO_LEN)
+        self._frame_len: int = 0
+        self._info_frame: bytes = b""
+        self._info_requested: bool = False  # 0x97 sent on this connection
         self._char_write_handle: int = -1
         self._bms_info: dict[str, str] = {}
         self._prot_offset: int = 0
-        self._valid_reply: int = 0x02
+        self._valid_reply: int = BMS._CELL_INFO
+        self._sample: BMSsample | None = {} if reuse_sample else None
+
+    def _notification_handler(
+        self, _sender: BleakGATTCharacteristic, data: bytearray
+    ) -> None:
+        """Assemble notifications into INFO_LEN frames and keep the valid ones."""
+        if data.startswith(BMS.BT_MODULE_MSG):
+            data = data[len(BMS.BT_MODULE_MSG) :]  # BT module chatter, not BMS data
+            if not data:
+                return
+        if data.startswith(BMS.HEAD_RSP):
+            self._frame_len = 0
+        elif not self._frame_len:
+            self._log.debug("dropping data without frame header: %s", data.hex(" "))
+            return
+
+        take = min(len(data), BMS.INFO_LEN - self._frame_len)
+        self._frame[self._frame_len : self._frame_len + take] = data[:take]
+        self._frame_len += take
+        if self._frame_len < BMS.INFO_LEN:
+            return
+        self._frame_len = 0
+        self._handle_frame()
+        if take < len(data):
+            self._notification_handler(_sender, data[take:])
+
+    def _handle_frame(self) -> None:
+        """Check a complete frame and store it by type."""
+        frame = self._frame
+        with memoryview(frame) as view:
+            crc = crc_sum(view[:-1])
+        if crc != frame[-1]:
+            self._log.debug("invalid checksum 0x%X != 0x%X", frame[-1], crc)
+            return
+        ftype = frame[BMS.TYPE_POS]
+        if ftype == BMS._CELL_INFO:
+            self._data_final[:] = frame
+            self._data_time = time.monotonic()
+        elif ftype == BMS._DEVICE_INFO:
+            self._info_frame = bytes(frame)
+            self._bms_info = {
+                key: frame[start:end].rstrip(b"\x00").decode(errors="replace")
+                for key, start, end in BMS._INFO_FIELDS
+            }
+        else:
+            self._log.debug("ignoring frame type 0x%X", ftype)
+            return
+        if ftype == self._valid_reply:
+            self._data_event.set()
+
+    async def _init_connection(
+        self, char_notify: BleakGATTCharacteristic | int | str | None = None
+    ) -> None:
+        """Start a connection; the device info may be requested once on it."""
+        self._info_requested = False
+        await super()._init_connection(char_notify)
+
+    async def _request_info(self) -> None:
+        """Request the device info frame once per connection until it arrives.
+
+        Devices that never answer 0x97 would otherwise cost a reply timeout
+        on every update.
+        """
+        if self._info_frame or self._info_requested:
+            return
+        self._info_requested = True
+        self._valid_reply = BMS._DEVICE_INFO
+        try:
+            await self._await_reply(data=BMS._cmd(b"\x97"), char=self._char_write_handle)
+        except TimeoutError:
+            self._log.debug("no device info reply")
+        finally:
+            self._valid_reply = BMS._CELL_INFO
 
     async def _async_update(self) -> BMSsample:
         """Retrieve real-time battery status information."""
-        if not self._data_event.is_set() or self._data_final[4] != 0x02:
+        await self._request_info()
+        # the BMS keeps streaming cell frames after one request; reuse them
+        if time.monotonic() - self._data_time > BMS._MAX_AGE:
             self._log.debug("Requesting battery info...")
             await self._await_reply(
                 data=BMS._cmd(b"\x96"), char=self._char_write_handle
             )
 
-        data: BMSsample = self._decode_data(self._data_final, self._prot_offset)
-        data.update(BMS._temp_sensors(self._data_final, self._prot_offset))
-        data.update(BMS._cell_voltages(self._data_final, int(data[KEY_CELL_COUNT])))
+        data: BMSsample = BMS._decode_data(self._data_final, self._prot_offset, self._sample)
+        BMS._temp_sensors(self._data_final, self._prot_offset, data)
+        BMS._cell_voltages(self._data_final, int(data[KEY_CELL_COUNT]), data)
 
         return data
     
@@ -80,28 +197,56 @@ class BMS(BaseBMS):
         return frame
 
     @staticmethod
-    def _decode_data(data: bytearray, offs: int) -> BMSsample:
-        """Decode battery management system status."""
-        return (
-            {
-                KEY_CELL_COUNT: int.from_bytes(
-                    data[70 + (offs >> 1) : 74 + (offs >> 1)], byteorder="little"
-                ).bit_count()
-            }
-            | {
-                ATTR_DELTA_VOLTAGE: int.from_bytes(
-                    data[76 + (offs >> 1) : 78 + (offs >> 1)], byteorder="little"
-                )
-                / 1000
-            }
-            | {
-                key: func(
-                    int.from_bytes(
-                        data[idx + offs : idx + offs + size],
-                        byteorder="little",
-                        signed=sign,
-                    )
-                )
-                for key, idx, size, sign, func in BMS._FIELDS
-            }
-        )
+    @cache
+    def _layout(offs: int) -> tuple[struct.Struct, tuple[tuple[str, Callable], ...]]:
+        """Compile the fields of one protocol offset into a single struct.
+
+        JK02_32S uses offset 0 and JK02_24S -32; the cell mask and delta
+        voltage sit after the cell voltages and only move by offs >> 1.
+        """
+        fields = [
+            (KEY_CELL_COUNT, 70 + (offs >> 1), 4, False, int.bit_count),
+            (ATTR_DELTA_VOLTAGE, 76 + (offs >> 1), 2, False, lambda x: x / 1000),
+            *((key, idx + offs, size, sign, fn) for key, idx, size, sign, fn in BMS._FIELDS),
+        ]
+        fields.sort(key=lambda field: field[1])
+        fmt, pos = "<", 0
+        for key, idx, size, sign, _ in fields:
+            if idx < pos:
+                raise ValueError(f"field {key} overlaps the previous field")
+            fmt += f"{idx - pos}x" if idx > pos else ""
+            fmt += BMS._FORMATS[(size, sign)]
+            pos = idx + size
+        return struct.Struct(fmt), tuple((key, func) for key, _, _, _, func in fields)
+
+    @staticmethod
+    def _decode_data(
+        data: bytearray, offs: int, sample: BMSsample | None = None
+    ) -> BMSsample:
+        """Decode battery management system status, into sample if given."""
+        layout, convert = BMS._layout(offs)
+        if sample is None:
+            sample = {}
+        for (key, func), value in zip(convert, layout.unpack_from(data)):
+            sample[key] = func(value)
+        return sample
+
+    @staticmethod
+    def _temp_sensors(data: bytearray, offs: int, sample: BMSsample) -> BMSsample:
+        """Add the temperature probes (0.1 °C) to sample."""
+        pos = BMS._TEMP_POS + offs
+        with memoryview(data)[pos : pos + 2 * BMS._TEMP_SENSORS] as raw:
+            temps = raw.cast("h") if _NATIVE_LE else struct.unpack(f"<{len(raw) // 2}h", raw)
+            for idx, value in enumerate(temps):
+                sample[f"{KEY_TEMP_VALUE}{idx}"] = value / 10
+        return sample
+
+    @staticmethod
+    def _cell_voltages(data: bytearray, cells: int, sample: BMSsample) -> BMSsample:
+        """Add the voltage (V) of each of the first cells to sample."""
+        pos = BMS._CELL_POS
+        with memoryview(data)[pos : pos + 2 * cells] as raw:
+            volts = raw.cast("H") if _NATIVE_LE else struct.unpack(f"<{cells}H", raw)
+            for idx, value in enumerate(volts):
+                sample[f"{KEY_CELL_VOLTAGE}{idx}"] = value / 1000
+        return sample
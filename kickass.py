@@ -1,5 +1,21 @@
+import argparse
 import asyncio
-from bleak import BleakClient
+import functools
+import json
+import logging
+import logging.handlers
+import signal
+import sys
+from adaptive import AdaptiveInterval
+from bleconn import BLEConnection, ConnectionManager
+from commands import COMMANDS
+from drivers import DRIVERS, DriverRegistry
+from fleet import Fleet
+from gattcache import GattCache
+from metrics import render_fleet, serve
+from stats import Stats
+from subscriptions import HOME_DATA_DEADBANDS, JK_DEADBANDS, SubscriptionHub
+from transaction import ModbusClient
 
 # Replace with your BMS Bluetooth MAC address
 # BMS_MAC_ADDRESS = "C8:47:80:53:44:85"  # Change to actual BMS MAC address A4:C1:38:AF:32:0D
@@ -10,34 +26,167 @@ SERVICE_UUID = "0000FFE0-0000-1000-8000-00805f9b34fb"
 CHARACTERISTIC_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 
 # Modbus RTU Command to Read Home Data
-HOME_DATA_CMD = bytes.fromhex("01 03 01 01 00 13 54 3B")
+HOME_DATA_CMD = COMMANDS["Read Home Data"]
 
-async def send_command_async():
-    async with BleakClient(BMS_MAC_ADDRESS) as client:
-        if await client.is_connected():
-            print(f"Connected to BMS: {BMS_MAC_ADDRESS}")
+# Daemon config, e.g. kickass.json holding
+# {"devices": [{"address": "C8:47:80:53:44:85", "name": "MPPT-1"}]}
+# (devices.json is the scan cache of registry.DeviceRegistry, not a config)
+DEFAULT_CONFIG = {
+    "devices": [],
+    "output": "-",  # "-" for stdout, otherwise a file rotated at max_bytes
+    "max_bytes": 10 * 1024 * 1024,
+    "backups": 3,
+    "metrics_host": "127.0.0.1",
+    "metrics_port": 9108,  # 0 disables the endpoint
+    "max_concurrent": 3,
+    "deadbands": True,  # write only changes beyond HOME_DATA_DEADBANDS
+    "heartbeat": 60.0,
+    "gatt_cache": "gatt.json",
+    "drivers": "drivers.json",  # protocol chosen per address; a device may set "driver"
+    "adaptive": None,  # e.g. {"min_interval": 0.5, "max_interval": 10} to adapt Home Data
+}
 
-            # Enable Notifications for Receiving Data
-            def notification_handler(sender, data):
-                print(f"Received: {data.hex()}")
+_LOGGER = logging.getLogger("kickass")
 
-            await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
+async def send_command_async(stats=None):
+    conn = BLEConnection(BMS_MAC_ADDRESS, CHARACTERISTIC_UUID, stats=stats)
+    client = ModbusClient(conn)
+    try:
+        await conn.connect()
+        print(f"Connected to BMS: {BMS_MAC_ADDRESS}")
 
-            # Send Command
-            print(f"Sending Command: {HOME_DATA_CMD.hex()}")
-            await client.write_gatt_char(CHARACTERISTIC_UUID, HOME_DATA_CMD)
+        # Send Command and wait only as long as the reply takes
+        print(f"Sending Command: {HOME_DATA_CMD.hex()}")
+        response = await client.request(HOME_DATA_CMD, timeout=5)
+        print(f"Received: {response.hex()}")
+    except ConnectionError:
+        print("Failed to connect to BMS.")
+    except TimeoutError:
+        print("No response from BMS.")
+    finally:
+        await conn.close()
 
-            # Wait for response
-            await asyncio.sleep(5)  # Wait to receive data
-            
-            await client.stop_notify(CHARACTERISTIC_UUID)
+def load_config(path):
+    """Reads the daemon config, filling in defaults; ValueError if malformed."""
+    with open(path, encoding="utf-8") as file:
+        try:
+            loaded = json.load(file)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{path}: not valid JSON: {exc}") from None
+    if not isinstance(loaded, dict):
+        raise ValueError(f"{path}: expected a JSON object with a \"devices\" list")
+    config = {**DEFAULT_CONFIG, **loaded}
+    devices = config["devices"]
+    if not isinstance(devices, list):
+        raise ValueError(f"{path}: \"devices\" must be a list of objects with an \"address\"")
+    if not devices:
+        raise ValueError(f"{path} lists no devices")
+    for pos, device in enumerate(devices):
+        if not isinstance(device, dict) or not isinstance(device.get("address"), str):
+            raise ValueError(f"{path}: devices[{pos}] must be an object with an "
+                             f"\"address\", got {device!r}")
+        names = [d.name for d in DRIVERS]
+        if "driver" in device and device["driver"] not in names:
+            raise ValueError(f"{path}: devices[{pos}] has driver {device['driver']!r}, "
+                             f"expected one of {', '.join(names)}")
+    return config
 
-        else:
-            print("Failed to connect to BMS.")
+def sample_writer(config):
+    """Returns a callback writing each sample as one JSON line."""
+    out = logging.getLogger("kickass.samples")
+    out.propagate = False
+    out.setLevel(logging.INFO)
+    if config["output"] == "-":
+        handler = logging.StreamHandler(sys.stdout)
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            config["output"], maxBytes=config["max_bytes"], backupCount=config["backups"],
+            encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    out.addHandler(handler)
 
-# ✅ Fix: Run inside an existing event loop
-try:
-    loop = asyncio.get_running_loop()  # Check if an event loop is already running
-    task = loop.create_task(send_command_async())  # Run the task without blocking
-except RuntimeError:  # If no event loop is running, create one
-    asyncio.run(send_command_async())
+    def write(sample):
+        out.info(json.dumps({"ts": round(sample.timestamp, 3), "address": sample.address,
+                             **sample.values}, separators=(",", ":")))
+    return write
+
+async def run_daemon(config):
+    """Polls every configured device until SIGINT/SIGTERM."""
+    write = sample_writer(config)
+    on_sample = write
+    if config["deadbands"]:
+        hub = SubscriptionHub()
+        # Modbus and JK devices report different fields; each sample carries only its own
+        hub.subscribe(write, {**HOME_DATA_DEADBANDS, **JK_DEADBANDS},
+                      max_age=config["heartbeat"], full=True)
+        on_sample = hub.publish
+    cache = GattCache(config["gatt_cache"]) if config["gatt_cache"] else None
+    registry = DriverRegistry(config["drivers"] or None)
+    stats = Stats()
+    adaptive = None
+    if config["adaptive"] is not None:
+        adaptive = functools.partial(AdaptiveInterval, **config["adaptive"])
+    fleet = Fleet(ConnectionManager(max_attempts=1, gatt_cache=cache, stats=stats),
+                  max_concurrent=config["max_concurrent"], on_sample=on_sample,
+                  adaptive=adaptive, drivers=registry)
+    for device in config["devices"]:
+        driver = registry.named(device["driver"]) if "driver" in device else None
+        fleet.add(device["address"], device.get("name", ""), driver)
+
+    server = None
+    if config["metrics_port"]:
+        server = await serve(lambda: render_fleet(fleet) + stats.render_prometheus(),
+                             config["metrics_host"], config["metrics_port"])
+        _LOGGER.info("metrics on http://%s:%d/metrics", config["metrics_host"],
+                     config["metrics_port"])
+
+    task = asyncio.ensure_future(fleet.run())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except NotImplementedError:  # Windows
+            pass
+    if hasattr(signal, "SIGUSR1"):
+        # kill -USR1 <pid> dumps the latency table to stderr
+        loop.add_signal_handler(signal.SIGUSR1, lambda: print(stats.format(), file=sys.stderr))
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        print(stats.format(), file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Read a BMS/MPPT once, or poll devices headless.")
+    parser.add_argument("--config", metavar="PATH",
+                        help="JSON device config, e.g. kickass.json; runs the polling daemon")
+    parser.add_argument("--output", help="JSON-lines file, or - for stdout")
+    parser.add_argument("--metrics-port", type=int, help="Prometheus port, 0 to disable")
+    parser.add_argument("--stats", action="store_true", help="print BLE timings after a one-shot read")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        stream=sys.stderr)
+
+    if not args.config:
+        stats = Stats() if args.stats else None
+        asyncio.run(send_command_async(stats))
+        if stats is not None:
+            print(stats.format())
+        return
+    try:
+        config = load_config(args.config)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.output is not None:
+        config["output"] = args.output
+    if args.metrics_port is not None:
+        config["metrics_port"] = args.metrics_port
+    asyncio.run(run_daemon(config))
+
+if __name__ == "__main__":
+    main()
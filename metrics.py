@@ -0,0 +1,85 @@
+"""Module serving fleet values and counters in Prometheus text format."""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Any, Final
+
+from registers import HOME_DATA
+
+_LOGGER = logging.getLogger(__name__)
+
+PREFIX: Final = "kickass_"
+CONTENT_TYPE: Final = "text/plain; version=0.0.4; charset=utf-8"
+
+# summary() key, metric name, metric type, help
+_COUNTERS: Final = (
+    ("samples", "samples_total", "counter", "Poll cycles that returned data"),
+    ("errors", "errors_total", "counter", "Failed block reads and connects"),
+    ("missed_deadlines", "missed_deadlines_total", "counter", "Skipped poll slots"),
+    ("crc_errors", "crc_errors_total", "counter", "Frames dropped for a bad CRC"),
+    ("busy_time", "busy_seconds_total", "counter", "Time spent holding an adapter slot"),
+    ("rate", "poll_rate", "gauge", "Recent samples per second"),
+    ("interval", "poll_interval_seconds", "gauge", "Adaptive Home Data interval, 0 if fixed"),
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_fleet(fleet: Any) -> str:
+    """Return the latest values and per-device counters of a Fleet."""
+    lines: list[str] = []
+    devices = list(fleet.devices.values())
+    values: dict[str, list[str]] = {}
+    for dev in devices:
+        labels = _labels(address=dev.address, name=dev.name)
+        for field, value in dev.poller.latest.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values.setdefault(field, []).append(f"{PREFIX}{field}{labels} {value}")
+    for field, samples in values.items():
+        unit = HOME_DATA.units.get(field)
+        help_text = f"Latest {field.replace('_', ' ')}" + (f" ({unit})" if unit else "")
+        lines += [f"# HELP {PREFIX}{field} {help_text}", f"# TYPE {PREFIX}{field} gauge"]
+        lines += samples
+    summaries = [(dev, dev.summary()) for dev in devices]
+    for key, metric, kind, help_text in _COUNTERS:
+        lines += [f"# HELP {PREFIX}{metric} {help_text}", f"# TYPE {PREFIX}{metric} {kind}"]
+        lines += [
+            f"{PREFIX}{metric}{_labels(address=dev.address, name=dev.name)} {summary[key]}"
+            for dev, summary in summaries
+        ]
+    return "\n".join(lines) + "\n"
+
+
+async def serve(
+    render: Callable[[], str], host: str = "127.0.0.1", port: int = 9108
+) -> asyncio.Server:
+    """Answer GET /metrics with render() on the running loop."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5.0)
+            while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+                pass  # headers are not needed
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+                status, body = "200 OK", render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (TimeoutError, ConnectionError) as exc:
+            _LOGGER.debug("metrics request failed: %s", exc)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
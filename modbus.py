@@ -0,0 +1,119 @@
+"""Module with the Modbus RTU framing used by the MPPT/BMS controllers."""
+
+import struct
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Final
+
+READ_HOLDING: Final[int] = 0x03
+WRITE_SINGLE: Final[int] = 0x06
+WRITE_MULTIPLE: Final[int] = 0x10
+EXCEPTION_FLAG: Final[int] = 0x80
+
+HEADER_LEN: Final[int] = 3  # address, function, byte count
+CRC_LEN: Final[int] = 2
+MAX_READ_COUNT: Final[int] = 125
+MAX_WRITE_COUNT: Final[int] = 123
+
+
+def _crc_table() -> tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC_TABLE: Final = _crc_table()
+
+
+class ModbusError(Exception):
+    """Raised when a device answers with a Modbus exception response."""
+
+    def __init__(self, function: int, code: int) -> None:
+        """Initialize from the request function and exception code."""
+        super().__init__(f"function 0x{function:02X} failed with exception {code}")
+        self.function = function
+        self.code = code
+
+
+def crc16(data: bytes | bytearray | memoryview) -> int:
+    """Return the CRC16/Modbus of data."""
+    crc = 0xFFFF
+    table = _CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def append_crc(frame: bytes) -> bytes:
+    """Return frame with its little-endian CRC16 appended."""
+    return frame + crc16(frame).to_bytes(2, "little")
+
+
+def check_crc(frame: bytes | bytearray | memoryview) -> bool:
+    """Return True if the trailing two bytes are the CRC16 of the rest."""
+    size = len(frame)
+    return size > CRC_LEN and crc16(frame[: size - CRC_LEN]) == (
+        frame[size - 2] | frame[size - 1] << 8
+    )
+
+
+def _check_range(name: str, value: int, low: int, high: int) -> int:
+    if not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"{name} must be an integer in {low}..{high}, got {value!r}")
+    return value
+
+
+def _word(value: int) -> int:
+    """Return value as an unsigned 16 bit register, accepting signed input."""
+    return _check_range("register value", value, -0x8000, 0xFFFF) & 0xFFFF
+
+
+@lru_cache(maxsize=256)
+def build_frame(unit: int, function: int, payload: bytes = b"") -> bytes:
+    """Return a complete frame for any function code, CRC included."""
+    _check_range("unit", unit, 0, 247)
+    _check_range("function", function, 1, 0x7F)
+    return append_crc(bytes((unit, function)) + payload)
+
+
+def read_holding(register: int, count: int, unit: int = 1) -> bytes:
+    """Return a 0x03 read holding registers request."""
+    _check_range("register", register, 0, 0xFFFF)
+    _check_range("count", count, 1, MAX_READ_COUNT)
+    return build_frame(unit, READ_HOLDING, struct.pack(">HH", register, count))
+
+
+def write_single(register: int, value: int, unit: int = 1) -> bytes:
+    """Return a 0x06 write single register request."""
+    _check_range("register", register, 0, 0xFFFF)
+    return build_frame(unit, WRITE_SINGLE, struct.pack(">HH", register, _word(value)))
+
+
+def write_multiple(register: int, values: Sequence[int], unit: int = 1) -> bytes:
+    """Return a 0x10 write multiple registers request."""
+    _check_range("register", register, 0, 0xFFFF)
+    count = _check_range("count", len(values), 1, MAX_WRITE_COUNT)
+    words = [_word(v) for v in values]
+    return build_frame(
+        unit,
+        WRITE_MULTIPLE,
+        struct.pack(f">HHB{count}H", register, count, 2 * count, *words),
+    )
+
+
+def unpack_registers(frame: bytes | bytearray | memoryview) -> tuple[int, ...]:
+    """Return the 16 bit register values carried by a 0x03 reply."""
+    return struct.unpack_from(f">{frame[2] // 2}H", frame, HEADER_LEN)
+
+
+def expected_response(request: bytes) -> tuple[int, int, int]:
+    """Return (address, function, length) of the reply to a request frame."""
+    address, function = request[0], request[1]
+    if function == READ_HOLDING:
+        count = int.from_bytes(request[4:6], "big")
+        return address, function, HEADER_LEN + 2 * count + CRC_LEN
+    return address, function, 8
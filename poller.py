@@ -0,0 +1,172 @@
+"""Module to poll register blocks continuously over one Modbus connection."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from adaptive import AdaptiveInterval
+from commands import COMMANDS
+from modbus import ModbusError, unpack_registers
+from registers import decode_home_data
+from transaction import ModbusClient
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PollBlock:
+    """A register block read every interval seconds."""
+
+    name: str
+    frame: bytes
+    interval: float
+    decode: Callable[[bytes], dict[str, Any]] | None = None
+    timeout: float | None = None
+
+
+@dataclass(slots=True)
+class Sample:
+    """Values read in one poll cycle, stamped when the cycle completed."""
+
+    timestamp: float
+    address: str
+    values: dict[str, Any]
+
+
+@dataclass(slots=True)
+class PollStats:
+    """Counters describing how well the poller keeps its schedule."""
+
+    samples: int = 0
+    errors: int = 0
+    missed_deadlines: int = 0
+    _times: deque = field(default_factory=lambda: deque(maxlen=64), repr=False)
+
+    def record(self, when: float) -> None:
+        """Count a completed sample at loop time when."""
+        self.samples += 1
+        self._times.append(when)
+
+    @property
+    def rate(self) -> float:
+        """Return the achieved samples per second over the recent window."""
+        if len(self._times) < 2:
+            return 0.0
+        span = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+def default_blocks() -> list[PollBlock]:
+    """Return the standard schedule: fast Home Data, slower auxiliary blocks."""
+    return [
+        PollBlock("home", COMMANDS["Read Home Data"], 0.5, decode_home_data),
+        PollBlock("overdata", COMMANDS["OVERDATA"], 5.0),
+        PollBlock("today", COMMANDS["TODAY_DATA"], 30.0),
+        PollBlock("mode_size", COMMANDS["MODE_SIZE"], 300.0),
+    ]
+
+
+class Poller:
+    """Read due blocks back-to-back each cycle and merge them into a Sample."""
+
+    def __init__(
+        self,
+        client: ModbusClient,
+        address: str = "",
+        blocks: list[PollBlock] | None = None,
+        on_sample: Callable[[Sample], None] | None = None,
+        pipeline_depth: int = 4,
+        adaptive: AdaptiveInterval | None = None,
+    ) -> None:
+        """Initialize the schedule; nothing is sent until run() is awaited.
+
+        With adaptive, the interval of its block follows the signals it returns.
+        """
+        self._client = client
+        self.address = address
+        self.blocks = default_blocks() if blocks is None else blocks
+        self._on_sample = on_sample
+        self._depth = max(1, pipeline_depth)
+        self._due: dict[str, float] = {}
+        self.stats = PollStats()
+        self.latest: dict[str, Any] = {}
+        self.adaptive = adaptive
+
+    def _decode(self, block: PollBlock, frame: bytes) -> dict[str, Any]:
+        if block.decode is not None:
+            return block.decode(frame)
+        return {block.name: unpack_registers(frame)}
+
+    async def poll_once(self, blocks: list[PollBlock]) -> Sample:
+        """Read blocks, keeping up to pipeline_depth requests in flight."""
+        started = asyncio.get_running_loop().time()
+        values: dict[str, Any] = {}
+        adapt = None
+        for pos in range(0, len(blocks), self._depth):
+            batch = blocks[pos : pos + self._depth]
+            futures = [await self._client.send(b.frame, b.timeout) for b in batch]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            for block, result in zip(batch, results):
+                if isinstance(result, (TimeoutError, ModbusError, ConnectionError)):
+                    self.stats.errors += 1
+                    _LOGGER.debug("%s: %s failed: %s", self.address, block.name, result)
+                    decoded = {}
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    decoded = self._decode(block, result)
+                    values.update(decoded)
+                if self.adaptive is not None and block.name == self.adaptive.block:
+                    adapt = (block, decoded)
+        if adapt is not None:
+            self._adapt(*adapt, started)
+        self.latest.update(values)
+        return Sample(time.time(), self.address, values)
+
+    def _adapt(self, block: PollBlock, values: dict[str, Any], started: float) -> None:
+        """Let the adaptive policy pick block's next interval and reschedule it."""
+        errors = self._client.timeouts + self._client.crc_errors
+        block.interval = self.adaptive.update(started, values, errors)
+        if self._due:
+            self._due[block.name] = started + block.interval
+
+    def due_blocks(self, now: float) -> list[PollBlock]:
+        """Return the blocks due at loop time now and advance their deadlines."""
+        if not self._due:
+            self._due = {b.name: now for b in self.blocks}
+        due = [b for b in self.blocks if self._due[b.name] <= now]
+        for block in due:
+            late = now - self._due[block.name]
+            if late >= block.interval:
+                # one or more whole slots were skipped
+                self.stats.missed_deadlines += int(late // block.interval)
+                self._due[block.name] = now + block.interval
+            else:
+                self._due[block.name] += block.interval
+        return due
+
+    @property
+    def next_due(self) -> float:
+        """Return the loop time at which the next block becomes due."""
+        return min(self._due.values(), default=0.0)
+
+    def deliver(self, sample: Sample, when: float) -> None:
+        """Count a sample completed at loop time when and hand it on."""
+        if not sample.values:
+            return
+        self.stats.record(when)
+        if self._on_sample is not None:
+            self._on_sample(sample)
+
+    async def run(self) -> None:
+        """Poll until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            due = self.due_blocks(loop.time())
+            if due:
+                self.deliver(await self.poll_once(due), loop.time())
+            await asyncio.sleep(max(0.0, self.next_due - loop.time()))
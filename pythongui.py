@@ -1,42 +1,42 @@
 import sys
-import asyncio
-from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QTextEdit, QComboBox
-from bleak import BleakScanner, BleakClient
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QComboBox
+from asyncworker import AsyncWorker
+from bleconn import ConnectionManager
+from commands import COMMANDS
+from drivers import DriverRegistry
+from gattcache import GattCache
+from modbus import ModbusError
+from registers import HOME_DATA, decode_bms_response, decode_home_data
+from registry import DeviceRegistry
+from transaction import ModbusClient
+from widgets import LogView, TelemetryPanel
 
 # Global Variables
 BMS_MAC_ADDRESS = None  # Will be set after scanning
-SERVICE_UUID = "0000FFE0-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
-
-
-COMMANDS = {
-    "Read Home Data": "01 03 01 01 00 13 54 3B"
-}
-
-def decode_bms_response(hex_response):
-    response_bytes = bytes.fromhex(hex_response)
-    battery_voltage_raw = int.from_bytes(response_bytes[3:5], byteorder="big")
-    battery_current_raw = int.from_bytes(response_bytes[5:7], byteorder="big")
-    battery_temperature_raw = int.from_bytes(response_bytes[7:9], byteorder="big")
-    charge_power_raw = int.from_bytes(response_bytes[9:11], byteorder="big")
-    controller_temperature_raw = response_bytes[21]
-    
-    battery_voltage = battery_voltage_raw * 0.251
-    battery_current = battery_current_raw * 0.0147
-    battery_temperature = battery_temperature_raw * 0.0078
-    charge_power = charge_power_raw * 0.1154
-    controller_temperature = controller_temperature_raw
-    
-    return (f"Battery Voltage: {battery_voltage:.2f}V\n"
-            f"Battery Current: {battery_current:.2f}A\n"
-            f"Battery Temperature: {battery_temperature:.2f}°C\n"
-            f"Charge Power: {charge_power:.2f}W\n"
-            f"Controller Temperature: {controller_temperature}°C")
 
 class BluetoothBMSGUI(QWidget):
+    log = pyqtSignal(str)
+    status = pyqtSignal(str)
+    values = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
+        # One loop and one connection per device shared by every button press
+        self.worker = AsyncWorker()
+        self.gatt = GattCache()
+        self.connections = ConnectionManager(gatt_cache=self.gatt)
+        self.clients = {}
+        # record every device some protocol driver recognizes, JK packs included
+        self.registry = DeviceRegistry(match=DriverRegistry(None).match_name)
         self.initUI()
+        # BLE work runs on the worker loop; widgets are only touched via signals
+        self.log.connect(self.response_area.append)
+        self.status.connect(self.device_label.setText)
+        self.values.connect(self.telemetry.update_values)
+        # Start on the last controller seen; a background scan keeps the list fresh
+        self.use_known_device()
+        self.worker.submit(self.registry.watch())
 
     def initUI(self):
         self.setWindowTitle("Bluetooth BMS Tool")
@@ -55,54 +55,66 @@ class BluetoothBMSGUI(QWidget):
         self.send_button.clicked.connect(self.send_command)
         self.layout.addWidget(self.send_button)
 
-        self.response_area = QTextEdit(self)
-        self.response_area.setReadOnly(True)
+        self.telemetry = TelemetryPanel([(name, HOME_DATA.units[name]) for name in HOME_DATA.names], self)
+        self.layout.addWidget(self.telemetry)
+
+        self.response_area = LogView(self)
         self.layout.addWidget(self.response_area)
 
         self.setLayout(self.layout)
 
     async def scan_devices_async(self):
         global BMS_MAC_ADDRESS
-        self.device_label.setText("Scanning...")
-        devices = await BleakScanner.discover()
-        for device in devices:
-            if "BMS" in device.name or "MPPT" in device.name:
-                BMS_MAC_ADDRESS = device.address
-                self.device_label.setText(f"Selected Device: {BMS_MAC_ADDRESS}")
-                return
-        self.device_label.setText("No BMS found")
+        self.status.emit("Scanning...")
+        found = await self.registry.scan()
+        if not found:
+            self.status.emit("No BMS found")
+            return
+        BMS_MAC_ADDRESS = found[0].address
+        self.status.emit(f"Selected Device: {BMS_MAC_ADDRESS}")
+
+    def use_known_device(self):
+        global BMS_MAC_ADDRESS
+        known = self.registry.known()
+        if known:
+            BMS_MAC_ADDRESS = known[0].address
+            self.status.emit(f"Known Device: {known[0].name} ({BMS_MAC_ADDRESS})")
 
     def scan_devices(self):
-        asyncio.create_task(self.scan_devices_async())
+        self.worker.submit(self.scan_devices_async())
 
     async def send_command_async(self):
+        command_bytes = COMMANDS["Read Home Data"]
+        self.log.emit(f"Sent: {command_bytes.hex(' ')}")
+        try:
+            response = await self.device_client().request(command_bytes)
+        except (TimeoutError, ConnectionError, ModbusError) as e:
+            self.log.emit(f"No valid response: {e}")
+            return
+        self.log.emit(f"Received: {response.hex()}")
+        try:
+            self.values.emit(decode_home_data(response))
+        except ValueError as e:
+            self.log.emit(f"Error decoding response: {str(e)}")
+
+    def device_client(self):
+        client = self.clients.get(BMS_MAC_ADDRESS)
+        if client is None:
+            client = ModbusClient(self.connections.get(BMS_MAC_ADDRESS))
+            self.clients[BMS_MAC_ADDRESS] = client
+        return client
+
+    def send_command(self):
         if not BMS_MAC_ADDRESS:
             self.response_area.setText("No device selected. Scan first.")
             return
-        
-        command_hex = COMMANDS["Read Home Data"]
-        command_bytes = bytes.fromhex(command_hex)
-
-        async with BleakClient(BMS_MAC_ADDRESS) as client:
-            if await client.is_connected():
-                self.response_area.append(f"Connected to {BMS_MAC_ADDRESS}")
-                await client.write_gatt_char(CHARACTERISTIC_UUID, command_bytes)
-                self.response_area.append(f"Sent: {command_hex}")
-
-                def notification_handler(sender, data):
-                    hex_data = data.hex()
-                    self.response_area.append(f"Received: {hex_data}")
-                    decoded_response = decode_bms_response(hex_data)
-                    self.response_area.append(decoded_response)
-                
-                await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
-                await asyncio.sleep(5)
-                await client.stop_notify(CHARACTERISTIC_UUID)
-            else:
-                self.response_area.append("Failed to connect.")
+        self.worker.submit(self.send_command_async())
 
-    def send_command(self):
-        asyncio.create_task(self.send_command_async())
+    def closeEvent(self, event):
+        self.worker.submit(self.connections.close()).result(5)
+        self.worker.stop()
+        self.registry.save()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
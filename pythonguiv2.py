@@ -1,47 +1,33 @@
 import sys
-import asyncio
-import threading
-from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QTextEdit, QLineEdit
-from bleak import BleakScanner, BleakClient
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QLineEdit, QComboBox
+from adaptive import AdaptiveInterval
+from asyncworker import AsyncWorker
+from bleconn import ConnectionManager
+from commands import BATTERY_TYPE_REG, COMMANDS, SYSTEM_VOLTAGE_REG
+from drivers import DriverRegistry
+from gattcache import GattCache
+from history import HistoryCache, HistoryDownloader
+from modbus import ModbusError, write_single
+from poller import Poller
+import registers
+from registers import HOME_DATA, decode_home_data
+from registry import DeviceRegistry
+from settings import SettingsEditor, SettingsError
+from stats import Stats
+from subscriptions import HOME_DATA_DEADBANDS, SubscriptionHub
+from transaction import ModbusClient
+from trends import TrendBuffer
+from tsstore import SampleStore
+from widgets import LogView, StatsPanel, TelemetryPanel, TrendPlot
 import struct
 
 # Global Variables
 BMS_MAC_ADDRESS = None  # Will be set after scanning.  C8:47:80:53:44:85
-SERVICE_UUID = "0000FFE0-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
-SERVICE1_UUID = "00001800-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC10_UUID = "00002A00-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC10_UUID = "00002A01-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC10_UUID = "00002A02-0000-1000-8000-00805f9b34fb"
-CHARACTERISTIC10_UUID = "00002A04-0000-1000-8000-00805f9b34fb"
-CLIENT_CHARACTERISTIC_CONFIG  = "00002902-0000-1000-8000-00805f9b34fb"
-
-
-
-COMMANDS = {
-    "Read Home Data": "01 03 01 01 00 13 54 3B",
-    "Set System Voltage": "01 06 00 10",  # Placeholder
-    "Set Battery Type": "01 06 00 20",  # Placeholder
-    "CHART_TODAY": "01 03 04 00 00 05 84 F9",
-    "NEW_CHART_TODAY": "01 03 04 00 00 05", # from decompiler
-    "Clear_historical_data": "01 79 FF FF FF FF 9D 94",
-    "Forced_CHECK": "01 06 01 21 01 FF 99 EC",
-    "Restore_Factory_Settings": "01 78 FF FF FF FF A0 54",
-    "Read_SETTINGS": "01 03 02 01 00 11 E4 7E 15 C0",
-    "Forced_CHECK" : "01 06 01 21 01 FF 99 EC",
-    "Forced_CHECK1_CLOSE" : "01 06 01 20 00 00 89 FC",
-    "Forced_CHECK1_OPEN" : "01 06 01 20 00 01 48 3C",
-    "Forced_CHECK3_CLOSE" : "01 06 01 21 FF 00 99 CC",
-    "Forced_CHECK3_OPEN" : "01 06 01 21 FF 01 58 0C",
-    "Forced_Load_Short" : "01 03 01 21 00 01 D5 FC",
-    "MODE_SIZE" : "01 03 00 0B 00 01 F5 C8",
-    "OVERDATA" : "01 03 01 01 00 11 D5 FA",
-    "SETTING_RETURN" : "01 10 02 00 00 15 00 7E",
-    "SETTING_RETURN2" : "01 10 03 00 00 0C C0 48",
-    "TODAY_DATA" : "01 03 04 00 00 05"
-   
- }
- # Format of the Commands
+TREND_WINDOWS = [("1 min", 60), ("10 min", 600), ("1 h", 3600), ("24 h", 86400)]
+POLL_FIELDS = [("poll_rate", "samples/s"), ("poll_interval", "s"), ("missed_deadlines", ""), ("poll_errors", "")]
+
+# Format of the Commands
 # 01 → Device Address (Master ID 01)
 # 03 → Function Code (03 = Read Holding Registers)
 # 00 0A → Starting Register Address (0A = Register 10)
@@ -116,41 +102,45 @@ def decode_bms_response(hex_response):
     """
     Decodes a Modbus RTU response from the BMS device.
     """
-    try:
-        response_bytes = bytes.fromhex(hex_response)
-        
-        if len(response_bytes) < 23:
-            return "Invalid response length"
-        
-        battery_voltage_raw = int.from_bytes(response_bytes[5:7], byteorder="big")
-        battery_current_raw = int.from_bytes(response_bytes[5:7], byteorder="big")
-        battery_temperature_raw = response_bytes[12]
-        charge_power_raw = int.from_bytes(response_bytes[9:11], byteorder="big")
-        controller_temperature_raw = response_bytes[11]
-        
-        battery_voltage = battery_voltage_raw * 1
-        battery_current = battery_current_raw * 1
-        battery_temperature = battery_temperature_raw * 1
-        charge_power = charge_power_raw * 1
-        controller_temperature = controller_temperature_raw
-        
-        return (f"Battery Voltage: {battery_voltage:.2f}V\n"
-                f"Battery Current: {battery_current:.2f}A\n"
-                f"Battery Temperature: {battery_temperature:.2f}°C\n"
-                f"Charge Power: {charge_power:.2f}W\n"
-                f"Controller Temperature: {controller_temperature}°C\n"
-                f"Battery Voltage_raw: {battery_voltage_raw:.2f}V\n"
-                f"Battery Current_raw: {battery_current_raw:.2f}A\n"
-                f"Battery Temperature_raw: {battery_temperature_raw:.2f}°C\n"
-                f"Charge Power_raw: {charge_power_raw:.2f}W\n"
-                f"Controller Temperature_raw: {controller_temperature_raw}°C")
-    except Exception as e:
-        return f"Error decoding response: {str(e)}"
+    return registers.decode_bms_response(hex_response, raw=True)
 
 class BluetoothBMSGUI(QWidget):
+    log = pyqtSignal(str)
+    status = pyqtSignal(str)
+    values = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
+        # One loop and one connection per device shared by every button press
+        self.worker = AsyncWorker()
+        self.gatt = GattCache()
+        self.stats = Stats()
+        self.connections = ConnectionManager(gatt_cache=self.gatt, stats=self.stats)
+        self.clients = {}
+        self.editors = {}
+        # record every device some protocol driver recognizes, JK packs included
+        self.registry = DeviceRegistry(match=DriverRegistry(None).match_name, stats=self.stats)
+        self.poller = None
+        self.poll_future = None
+        self.store = SampleStore("samples")
+        try:
+            # every sample, 24 h at 10 Hz, charted without going through the deadbands
+            self.trends = TrendBuffer()
+        except ImportError:  # charts need NumPy
+            self.trends = None
+        self.history = HistoryCache()
+        # Only changes beyond the deadbands reach the disk and the widgets
+        self.hub = SubscriptionHub()
+        self.hub.subscribe(self.store.append, HOME_DATA_DEADBANDS, max_age=60, full=True)
+        self.hub.subscribe(lambda sample: self.values.emit(sample.values), HOME_DATA_DEADBANDS, max_age=5)
         self.initUI()
+        # BLE work runs on the worker loop; widgets are only touched via signals
+        self.log.connect(self.response_area.append)
+        self.status.connect(self.device_label.setText)
+        self.values.connect(self.telemetry.update_values)
+        # Start on the last controller seen; a background scan keeps the list fresh
+        self.use_known_device()
+        self.worker.submit(self.registry.watch())
 
     def initUI(self):
         self.setWindowTitle("Bluetooth BMS Tool")
@@ -168,6 +158,10 @@ class BluetoothBMSGUI(QWidget):
         self.send_button = QPushButton("Request Home Data", self)
         self.send_button.clicked.connect(self.send_command)
         self.layout.addWidget(self.send_button)
+
+        self.poll_button = QPushButton("Start Polling", self)
+        self.poll_button.clicked.connect(self.toggle_polling)
+        self.layout.addWidget(self.poll_button)
         
         self.voltage_input = QLineEdit(self)
         self.voltage_input.setPlaceholderText("Enter System Voltage")
@@ -184,87 +178,232 @@ class BluetoothBMSGUI(QWidget):
         self.set_battery_button = QPushButton("Set Battery Type", self)
         self.set_battery_button.clicked.connect(self.set_battery_type)
         self.layout.addWidget(self.set_battery_button)
+
+        # Edits are staged locally and written together with one 0x10 request
+        self.read_settings_button = QPushButton("Read Settings", self)
+        self.read_settings_button.clicked.connect(self.read_settings)
+        self.layout.addWidget(self.read_settings_button)
+
+        self.apply_settings_button = QPushButton("Apply Settings", self)
+        self.apply_settings_button.clicked.connect(self.apply_settings)
+        self.layout.addWidget(self.apply_settings_button)
+
+        # Only days missing from the local cache are read from the device
+        self.history_button = QPushButton("Download History", self)
+        self.history_button.clicked.connect(self.download_history)
+        self.layout.addWidget(self.history_button)
         
-        self.response_area = QTextEdit(self)
-        self.response_area.setReadOnly(True)
+        self.telemetry = TelemetryPanel([(name, HOME_DATA.units[name]) for name in HOME_DATA.names] + POLL_FIELDS, self)
+        self.layout.addWidget(self.telemetry)
+
+        if self.trends is not None:
+            self.trend_window = QComboBox(self)
+            for label, seconds in TREND_WINDOWS:
+                self.trend_window.addItem(label, seconds)
+            self.trend_window.setCurrentIndex(1)
+            self.layout.addWidget(self.trend_window)
+
+            self.trend_plot = TrendPlot(self.trends, HOME_DATA.units, self, window=600)
+            self.trend_window.currentIndexChanged.connect(
+                lambda _: self.trend_plot.set_window(self.trend_window.currentData()))
+            self.layout.addWidget(self.trend_plot)
+
+        self.response_area = LogView(self)
         self.layout.addWidget(self.response_area)
 
+        # Scan/connect/write/reply timings per device and command
+        self.stats_panel = StatsPanel(self.stats.format, self)
+        self.layout.addWidget(self.stats_panel)
+
         self.setLayout(self.layout)
 
+    def use_known_device(self):
+        global BMS_MAC_ADDRESS
+        known = self.registry.known()
+        if known:
+            BMS_MAC_ADDRESS = known[0].address
+            self.status.emit(f"Known Device: {known[0].name} ({BMS_MAC_ADDRESS})")
+
     def scan_devices(self):
-        scan_thread = threading.Thread(target=asyncio.run, args=(self.scan_devices_async(),))
-        scan_thread.start()
+        self.worker.submit(self.scan_devices_async())
 
     async def scan_devices_async(self):
         global BMS_MAC_ADDRESS
-        self.device_label.setText("Scanning...")
-        devices = await BleakScanner.discover()
-        for device in devices:
-            print(f"Device: {device.name} - {device.address}")
-            if device.name and ("BMS" in device.name or "MPPT" in device.name):
-                BMS_MAC_ADDRESS = device.address
-                self.device_label.setText(f"Selected Device: {BMS_MAC_ADDRESS}")
-
-                async with BleakClient(BMS_MAC_ADDRESS) as client:
-                    if await client.is_connected():
-                        services = await client.get_services()
-                        for service in services:
-                            print(f"Service: {service.uuid}")
-                            for char in service.characteristics:
-                                print(f"  Characteristic: {char.uuid} - {char.properties}")
+        self.status.emit("Scanning...")
+        found = await self.registry.scan()
+        if not found:
+            self.status.emit("No BMS found")
+            return
+        BMS_MAC_ADDRESS = found[0].address
+        self.status.emit(f"Selected Device: {BMS_MAC_ADDRESS}")
+
+        entry = self.gatt.get(BMS_MAC_ADDRESS, found[0].name)
+        if entry is None:
+            # The first connection walks the services and caches the table
+            try:
+                await self.connections.get(BMS_MAC_ADDRESS, found[0].name).connect()
+            except ConnectionError as e:
+                self.log.emit(str(e))
                 return
-        self.device_label.setText("No BMS found")
+            entry = self.gatt.get(BMS_MAC_ADDRESS)
+        if entry is not None:
+            self.log.emit(entry.describe())
 
     def send_command(self):
-        command_thread = threading.Thread(target=asyncio.run, args=(self.send_command_async(),))
-        command_thread.start()
+        if not BMS_MAC_ADDRESS:
+            self.response_area.setText("No device selected. Scan first.")
+            return
+        self.worker.submit(self.send_command_async())
 
     async def send_command_async(self):
+        command_bytes = COMMANDS["Read Home Data"]
+        self.log.emit(f"Sent: {command_bytes.hex(' ')}")
+        try:
+            response = await self.device_client().request(command_bytes)
+        except (TimeoutError, ConnectionError, ModbusError) as e:
+            self.log.emit(f"No valid response: {e}")
+            return
+        self.show_response(response)
+
+    def device_client(self):
+        """Return the Modbus client sharing the selected device's connection."""
+        client = self.clients.get(BMS_MAC_ADDRESS)
+        if client is None:
+            client = ModbusClient(self.connections.get(BMS_MAC_ADDRESS))
+            self.clients[BMS_MAC_ADDRESS] = client
+        return client
+
+    def toggle_polling(self):
+        if self.poll_future is not None:
+            self.poll_future.cancel()
+            self.poll_future = None
+            self.poll_button.setText("Start Polling")
+            return
         if not BMS_MAC_ADDRESS:
             self.response_area.setText("No device selected. Scan first.")
             return
-        
-        command_hex = COMMANDS["Read Home Data"]
-        command_bytes = bytes.fromhex(command_hex)
-
-        async with BleakClient(BMS_MAC_ADDRESS) as client:
-            if await client.is_connected():
-                self.response_area.append(f"Connected to {BMS_MAC_ADDRESS}")
-                await client.start_notify(CHARACTERISTIC_UUID, self.notification_handler)  # ✅ Start notifications
-                await client.write_gatt_char(CHARACTERISTIC_UUID, command_bytes)
-                self.response_area.append(f"Sent: {command_hex}")
-
-                await asyncio.sleep(5)  # ✅ Allow time for response
-                await client.stop_notify(CHARACTERISTIC_UUID)
-                
-    async def notification_handler(self, sender, data):
-        """Handles incoming BLE notifications."""
-        hex_data = data.hex()
-        self.response_area.append(f"Received: {hex_data}")
-        decoded_response = decode_bms_response(hex_data)
-        self.response_area.append(decoded_response)
+        # Home Data is read fast while current, power or temperature move
+        self.poller = Poller(self.device_client(), BMS_MAC_ADDRESS, on_sample=self.show_sample,
+                             adaptive=AdaptiveInterval())
+        self.poll_future = self.worker.submit(self.poller.run())
+        self.poll_button.setText("Stop Polling")
+
+    def show_sample(self, sample):
+        """Passes one merged poll cycle to the subscribers and shows the poll rate."""
+        if self.trends is not None:
+            self.trends.append(sample.timestamp, sample.values)
+        self.hub.publish(sample)
+        stats = self.poller.stats
+        self.values.emit({"poll_rate": stats.rate, "poll_interval": self.poller.adaptive.interval,
+                          "missed_deadlines": stats.missed_deadlines, "poll_errors": stats.errors})
+
+    def show_response(self, response):
+        """Shows a complete, CRC-checked response frame."""
+        self.log.emit(f"Received: {response.hex()}")
+        try:
+            self.values.emit(decode_home_data(response))
+        except ValueError as e:
+            self.log.emit(f"Error decoding response: {str(e)}")
                 
     def set_system_voltage(self):
-        voltage = self.voltage_input.text()
-        command_hex = COMMANDS["Set System Voltage"] + voltage.zfill(4)
-        command_thread = threading.Thread(target=asyncio.run, args=(self.send_custom_command(command_hex),))
-        command_thread.start()
+        self.write_register(SYSTEM_VOLTAGE_REG, self.voltage_input.text())
 
     def set_battery_type(self):
-        battery_type = self.battery_type_input.text()
-        command_hex = COMMANDS["Set Battery Type"] + battery_type.zfill(4)
-        command_thread = threading.Thread(target=asyncio.run, args=(self.send_custom_command(command_hex),))
-        command_thread.start()
+        self.write_register(BATTERY_TYPE_REG, self.battery_type_input.text())
+
+    def write_register(self, register, text):
+        if not BMS_MAC_ADDRESS:
+            self.response_area.setText("No device selected. Scan first.")
+            return
+        editor = self.settings_editor()
+        try:
+            value = int(text, 0)
+            if register in editor:
+                editor[register] = value
+                self.response_area.append(
+                    f"Staged 0x{register:04X} = {value}; press Apply Settings to write")
+                return
+            command_bytes = write_single(register, value)
+        except (ValueError, SettingsError) as e:
+            self.response_area.append(f"Invalid value {text!r}: {e}")
+            return
+        self.worker.submit(self.send_custom_command(command_bytes))
+
+    def settings_editor(self):
+        """Return the settings editor sharing the selected device's client."""
+        editor = self.editors.get(BMS_MAC_ADDRESS)
+        if editor is None:
+            editor = SettingsEditor(self.device_client())
+            self.editors[BMS_MAC_ADDRESS] = editor
+        return editor
 
-    async def send_custom_command(self, command_hex):
+    def read_settings(self):
         if not BMS_MAC_ADDRESS:
             self.response_area.setText("No device selected. Scan first.")
             return
-        command_bytes = bytes.fromhex(command_hex)
-        async with BleakClient(BMS_MAC_ADDRESS) as client:
-            if await client.is_connected():
-                self.response_area.append(f"Sending: {command_hex}")
-                await client.write_gatt_char(CHARACTERISTIC_UUID, command_bytes)
+        self.worker.submit(self.read_settings_async(self.settings_editor()))
+
+    async def read_settings_async(self, editor):
+        try:
+            values = await editor.read()
+        except (TimeoutError, ConnectionError, ModbusError, SettingsError) as e:
+            self.log.emit(f"Reading settings failed: {e}")
+            return
+        self.log.emit("Settings: " + ", ".join(
+            f"0x{editor.register + i:04X}={v}" for i, v in enumerate(values)))
+
+    def apply_settings(self):
+        if not BMS_MAC_ADDRESS:
+            self.response_area.setText("No device selected. Scan first.")
+            return
+        self.worker.submit(self.apply_settings_async(self.settings_editor()))
+
+    async def apply_settings_async(self, editor):
+        try:
+            changes = await editor.apply()
+        except (TimeoutError, ConnectionError, ModbusError, SettingsError) as e:
+            self.log.emit(f"Settings not applied: {e}")
+            return
+        if not changes:
+            self.log.emit("No setting changed")
+            return
+        self.log.emit("Settings applied: " + ", ".join(
+            f"0x{r:04X} {old} -> {new}" for r, (old, new) in changes.items()))
+
+    def download_history(self):
+        if not BMS_MAC_ADDRESS:
+            self.response_area.setText("No device selected. Scan first.")
+            return
+        downloader = HistoryDownloader(self.device_client(), BMS_MAC_ADDRESS, self.history)
+        self.worker.submit(self.download_history_async(downloader))
+
+    async def download_history_async(self, downloader):
+        try:
+            counts = await downloader.download()
+        except (TimeoutError, ConnectionError, ModbusError) as e:
+            self.log.emit(f"History download stopped: {e}")
+            return
+        records = self.history.records(downloader.address)
+        self.log.emit(f"History: read {sum(counts.values())} records, "
+                      f"{len(records)} days cached")
+
+    async def send_custom_command(self, command_bytes):
+        self.log.emit(f"Sending: {command_bytes.hex(' ')}")
+        try:
+            response = await self.device_client().request(command_bytes)
+        except (TimeoutError, ConnectionError, ModbusError) as e:
+            self.log.emit(f"No valid response: {e}")
+            return
+        self.log.emit(f"Received: {response.hex()}")
+
+    def closeEvent(self, event):
+        if self.poll_future is not None:
+            self.poll_future.cancel()
+        self.worker.submit(self.connections.close()).result(5)
+        self.worker.stop()
+        self.registry.save()
+        self.store.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
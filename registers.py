@@ -0,0 +1,123 @@
+"""Module with the declarative register map of the MPPT/BMS Home Data block."""
+
+import struct
+from collections.abc import Sequence
+from typing import Any, Final
+
+_CODES: Final = {
+    (1, False): "B",
+    (1, True): "b",
+    (2, False): "H",
+    (2, True): "h",
+    (4, False): "I",
+    (4, True): "i",
+}
+
+# Home Data reply to "01 03 01 01 00 13": 01 03 26 <38 data bytes> <crc>
+HOME_DATA_LEN: Final[int] = 43
+
+HOME_DATA_FIELDS: Final[list[tuple[str, int, int, bool, float, str]]] = [
+    # name, frame offset, size, signed, scale, unit (big-endian registers)
+    ("battery_level", 3, 2, False, 1, "%"),
+    ("battery_voltage", 5, 2, False, 0.1, "V"),
+    ("battery_current", 7, 2, False, 0.01, "A"),
+    ("charge_power", 9, 2, False, 1, "W"),
+    ("controller_temperature", 11, 1, True, 1, "°C"),
+    ("battery_temperature", 12, 1, True, 1, "°C"),
+]
+
+
+class RegisterMap:
+    """Register map compiled to a struct.Struct and a NumPy structured dtype."""
+
+    def __init__(
+        self, fields: Sequence[tuple[str, int, int, bool, float, str]], frame_len: int
+    ) -> None:
+        """Compile fields for frames of frame_len bytes."""
+        self.fields: Final = sorted(fields, key=lambda f: f[1])
+        self.frame_len: Final = frame_len
+        self.names: Final = tuple(f[0] for f in self.fields)
+        self.units: Final = {f[0]: f[5] for f in self.fields}
+        self._scales = tuple(f[4] for f in self.fields)
+        fmt, pos = ">", 0
+        for name, offs, size, sign, _scale, _unit in self.fields:
+            if offs < pos or offs + size > frame_len:
+                raise ValueError(f"field {name} overlaps or exceeds the frame")
+            fmt += "x" * (offs - pos) + _CODES[size, sign]
+            pos = offs + size
+        self.struct: Final = struct.Struct(fmt)
+        self._dtype: Any = None
+
+    def unpack(self, frame: bytes | bytearray | memoryview) -> tuple[int, ...]:
+        """Return the raw register values of one frame."""
+        if len(frame) < self.frame_len:
+            raise ValueError(f"frame has {len(frame)} bytes, need {self.frame_len}")
+        return self.struct.unpack_from(frame)
+
+    def decode(self, frame: bytes | bytearray | memoryview) -> dict[str, float]:
+        """Return the scaled values of one frame."""
+        return {
+            name: raw * scale if scale != 1 else raw
+            for name, raw, scale in zip(self.names, self.unpack(frame), self._scales)
+        }
+
+    @property
+    def dtype(self) -> Any:
+        """Return the NumPy structured dtype of one whole frame."""
+        if self._dtype is None:
+            import numpy as np
+
+            self._dtype = np.dtype(
+                {
+                    "names": list(self.names),
+                    "formats": [f"{'>i' if f[3] else '>u'}{f[2]}" for f in self.fields],
+                    "offsets": [f[1] for f in self.fields],
+                    "itemsize": self.frame_len,
+                }
+            )
+        return self._dtype
+
+    def decode_batch(self, frames: Any) -> dict[str, Any]:
+        """Decode back-to-back frames in one vectorized pass.
+
+        frames is a buffer of n * frame_len bytes, e.g. a capture file read
+        with numpy.fromfile or a bytes object; returns one array per field.
+        """
+        import numpy as np
+
+        records = np.frombuffer(frames, dtype=self.dtype)
+        return {
+            name: records[name] * scale if scale != 1 else records[name]
+            for name, scale in zip(self.names, self._scales)
+        }
+
+    def format(self, values: dict[str, float]) -> str:
+        """Return values as one 'Name: value unit' line per field."""
+        return "\n".join(
+            f"{name.replace('_', ' ').title()}: {values[name]:.2f}{self.units[name]}"
+            for name in self.names
+        )
+
+
+HOME_DATA: Final = RegisterMap(HOME_DATA_FIELDS, HOME_DATA_LEN)
+
+
+def decode_home_data(frame: bytes | bytearray | memoryview) -> dict[str, float]:
+    """Decode a Home Data reply frame."""
+    return HOME_DATA.decode(frame)
+
+
+def decode_bms_response(hex_response: str, raw: bool = False) -> str:
+    """Decode a Home Data reply given as hex into display text.
+
+    With raw the undecoded register values follow the scaled ones.
+    """
+    try:
+        frame = bytes.fromhex(hex_response)
+        text = HOME_DATA.format(HOME_DATA.decode(frame))
+        if raw:
+            values = zip(HOME_DATA.names, HOME_DATA.unpack(frame))
+            text += "\n" + "\n".join(f"{name}_raw: {value}" for name, value in values)
+        return text
+    except ValueError as e:
+        return f"Error decoding response: {str(e)}"
@@ -0,0 +1,168 @@
+"""Module remembering seen controllers so startup can skip scanning."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from commands import is_controller_name
+from stats import ANY, Stats
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class KnownDevice:
+    """Last advertisement seen from a device."""
+
+    address: str
+    name: str | None
+    rssi: int | None
+    last_seen: float  # wall-clock seconds
+
+
+class DeviceRegistry:
+    """Controllers seen so far, persisted as JSON at path.
+
+    Only devices whose name passes match (or that are already known) are
+    recorded, so phones and beacons nearby do not fill the file.
+    """
+
+    def __init__(
+        self,
+        path: str = "devices.json",
+        match: Callable[[str | None], bool] = is_controller_name,
+        stats: Stats | None = None,
+    ) -> None:
+        """Load the registry from path if it exists; scan times go to stats."""
+        self.path = path
+        self.stats = stats
+        self._match = match
+        self.devices: dict[str, KnownDevice] = {}
+        self._dirty = False
+        self._listeners: list[Callable[[KnownDevice], None]] = []
+        self._watching = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for address, entry in json.load(file)["devices"].items():
+                    self.devices[address] = KnownDevice(address, **entry)
+
+    def save(self) -> None:
+        """Write the registry if it changed since the last save."""
+        if not self._dirty:
+            return
+        devices = {a: asdict(d) for a, d in self.devices.items()}
+        for entry in devices.values():
+            del entry["address"]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump({"devices": devices}, file, indent=1)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def known(self, max_age: float | None = None) -> list[KnownDevice]:
+        """Return known devices, most recently seen first."""
+        now = time.time()
+        found = [
+            d for d in self.devices.values() if max_age is None or now - d.last_seen <= max_age
+        ]
+        return sorted(found, key=lambda d: d.last_seen, reverse=True)
+
+    def seen(self, address: str, name: str | None, rssi: int | None) -> KnownDevice | None:
+        """Record an advertisement; return the entry if the device is kept."""
+        entry = self.devices.get(address)
+        if entry is None:
+            if not self._match(name):
+                return None
+            entry = self.devices[address] = KnownDevice(address, name, rssi, 0.0)
+        entry.name = name or entry.name
+        entry.rssi = rssi
+        entry.last_seen = time.time()
+        self._dirty = True
+        for listener in list(self._listeners):
+            listener(entry)
+        return entry
+
+    def _detected(self, device: Any, advertisement: Any) -> None:
+        self.seen(
+            device.address,
+            advertisement.local_name or device.name,
+            advertisement.rssi,
+        )
+
+    async def scan(
+        self,
+        count: int = 1,
+        addresses: Iterable[str] = (),
+        timeout: float = 10.0,
+        scanner: Any = None,
+    ) -> list[KnownDevice]:
+        """Scan until the wanted devices are seen or timeout passes.
+
+        With addresses the scan ends once all of them have advertised,
+        otherwise once count matching devices have. Returns the devices
+        seen, strongest signal first. While watch() runs its scanner is
+        shared rather than starting a second one.
+        """
+        wanted = set(addresses)
+        found: dict[str, KnownDevice] = {}
+        done = asyncio.Event()
+
+        def listener(entry: KnownDevice) -> None:
+            if wanted and entry.address not in wanted:
+                return
+            found[entry.address] = entry
+            if wanted <= found.keys() if wanted else len(found) >= count:
+                done.set()
+
+        self._listeners.append(listener)
+        started = time.monotonic()
+        try:
+            if self._watching:
+                await _wait(done, timeout)
+            else:
+                if scanner is None:
+                    from bleak import BleakScanner as scanner
+                async with scanner(detection_callback=self._detected):
+                    await _wait(done, timeout)
+        finally:
+            self._listeners.remove(listener)
+        if self.stats is not None:
+            self.stats.observe(ANY, ANY, "scan", time.monotonic() - started)
+        self.save()
+        return sorted(found.values(), key=lambda d: d.rssi or -128, reverse=True)
+
+    async def watch(
+        self,
+        scanner: Any = None,
+        save_interval: float = 30.0,
+        **scanner_kwargs: Any,
+    ) -> None:
+        """Keep the registry current from a background scan until cancelled.
+
+        scanner_kwargs go to the scanner. The scan is active by default:
+        passive mode needs bluez=dict(or_patterns=...) on BlueZ and does not
+        exist on macOS, so it is only used when asked for.
+        """
+        if scanner is None:
+            from bleak import BleakScanner as scanner
+        self._watching = True
+        try:
+            async with scanner(detection_callback=self._detected, **scanner_kwargs):
+                while True:
+                    await asyncio.sleep(save_interval)
+                    self.save()
+        finally:
+            self._watching = False
+            self.save()
+
+
+async def _wait(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except TimeoutError:
+        _LOGGER.debug("scan ended after %.1f s without every wanted device", timeout)
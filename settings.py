@@ -0,0 +1,105 @@
+"""Module to edit the controller settings block and write it in one transaction."""
+
+from collections.abc import Mapping
+
+from commands import SETTINGS_COUNT, SETTINGS_REG
+from modbus import WRITE_MULTIPLE, read_holding, unpack_registers, write_multiple
+from transaction import ModbusClient
+
+
+class SettingsError(Exception):
+    """The settings block could not be written as requested."""
+
+
+class SettingsEditor:
+    """Local copy of the settings registers plus the user's pending edits.
+
+    apply() sends the whole block with one 0x10 write, the transaction the
+    vendor app uses ("01 10 02 02 00 10 20 ..."), so the device never sees
+    a partly applied configuration.
+    """
+
+    def __init__(
+        self,
+        client: ModbusClient,
+        register: int = SETTINGS_REG,
+        count: int = SETTINGS_COUNT,
+        unit: int = 1,
+    ) -> None:
+        """Attach to client; call read() before editing."""
+        self._client = client
+        self.register = register
+        self.count = count
+        self.unit = unit
+        self.values: tuple[int, ...] | None = None  # as last read or written
+        self._edits: dict[int, int] = {}
+
+    def __contains__(self, register: int) -> bool:
+        return self.register <= register < self.register + self.count
+
+    def __getitem__(self, register: int) -> int:
+        """Return the edited value of register, else the device's."""
+        if register in self._edits:
+            return self._edits[register]
+        return self._device_value(register)
+
+    def __setitem__(self, register: int, value: int) -> None:
+        """Stage value for register; it is written by apply()."""
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError(f"value {value} does not fit a register")
+        if self._device_value(register) == value:
+            self._edits.pop(register, None)
+        else:
+            self._edits[register] = value
+
+    def _device_value(self, register: int) -> int:
+        if register not in self:
+            raise ValueError(
+                f"register 0x{register:04X} is outside the settings block "
+                f"0x{self.register:04X}-0x{self.register + self.count - 1:04X}"
+            )
+        if self.values is None:
+            raise SettingsError("settings have not been read yet")
+        return self.values[register - self.register]
+
+    def update(self, edits: Mapping[int, int]) -> None:
+        """Stage several edits at once."""
+        for register, value in edits.items():
+            self[register] = value
+
+    def changes(self) -> dict[int, tuple[int, int]]:
+        """Return {register: (device value, edited value)} of pending edits."""
+        return {r: (self._device_value(r), v) for r, v in sorted(self._edits.items())}
+
+    def discard(self) -> None:
+        """Drop all pending edits."""
+        self._edits.clear()
+
+    async def read(self) -> tuple[int, ...]:
+        """Read the block from the device, dropping pending edits."""
+        reply = await self._client.request(read_holding(self.register, self.count, self.unit))
+        values = unpack_registers(reply)
+        if len(values) != self.count:
+            raise SettingsError(f"expected {self.count} registers, got {len(values)}")
+        self.values = values
+        self._edits.clear()
+        return values
+
+    async def apply(self) -> dict[int, tuple[int, int]]:
+        """Write every pending edit in one 0x10 request; return what changed.
+
+        Raises SettingsError if the echo does not confirm the written range;
+        edits are kept so the write can be retried.
+        """
+        changes = self.changes()
+        if not changes:
+            return {}
+        values = tuple(self[r] for r in range(self.register, self.register + self.count))
+        request = write_multiple(self.register, values, self.unit)
+        echo = await self._client.request(request)
+        # echo: unit, 0x10, start register, register count, crc
+        if echo[:6] != bytes([self.unit, WRITE_MULTIPLE]) + request[2:6]:
+            raise SettingsError(f"write not confirmed, device answered {echo.hex(' ')}")
+        self.values = values
+        self._edits.clear()
+        return changes
@@ -0,0 +1,140 @@
+"""Module with low-overhead latency histograms for the BLE request path."""
+
+import bisect
+from collections import defaultdict
+from typing import Any, Final
+
+from commands import COMMANDS
+
+# Upper bucket bounds in seconds; anything slower lands in the overflow bucket
+BOUNDS: Final = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30)
+
+# timings: scan, connect (with full service discovery), connect_cached (only
+# the cached data service discovered), write, first_byte, frame
+# counters: crc_errors, timeouts, connect_retries, write_retries
+ANY: Final = "*"  # command key for timings not tied to one request
+
+_COMMAND_NAMES: Final = {frame: name for name, frame in COMMANDS.items()}
+
+
+def command_name(frame: bytes) -> str:
+    """Return the COMMANDS name of a request frame, or a function/register tag."""
+    name = _COMMAND_NAMES.get(bytes(frame))
+    if name is None and len(frame) >= 4:
+        name = f"fn{frame[1]:02x}@{int.from_bytes(frame[2:4], 'big'):04x}"
+    return name or ANY
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self) -> None:
+        """Initialize empty buckets."""
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Add one duration."""
+        self.buckets[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        """Return the mean duration."""
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Return the upper bound of the bucket holding quantile q, capped at max."""
+        rank = q * self.count
+        seen = 0
+        for idx, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(BOUNDS[idx], self.max) if idx < len(BOUNDS) else self.max
+        return 0.0
+
+
+class Stats:
+    """Histograms and counters keyed by (device, command, metric)."""
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self.histograms: dict[tuple[str, str, str], Histogram] = {}
+        self.counters: defaultdict[tuple[str, str, str], int] = defaultdict(int)
+
+    def observe(self, device: str, command: str, metric: str, seconds: float) -> None:
+        """Record one timing."""
+        key = (device, command, metric)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.observe(seconds)
+
+    def count(self, device: str, command: str, metric: str, n: int = 1) -> None:
+        """Add n to a counter."""
+        self.counters[(device, command, metric)] += n
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return all statistics as JSON-ready nested dicts, times in ms."""
+        result: dict[str, Any] = {}
+        for (device, command, metric), hist in list(self.histograms.items()):
+            result.setdefault(device, {}).setdefault(command, {})[metric] = {
+                "count": hist.count,
+                "mean_ms": round(hist.mean * 1000, 3),
+                "p50_ms": round(hist.quantile(0.5) * 1000, 3),
+                "p95_ms": round(hist.quantile(0.95) * 1000, 3),
+                "max_ms": round(hist.max * 1000, 3),
+            }
+        for (device, command, metric), n in list(self.counters.items()):
+            result.setdefault(device, {}).setdefault(command, {})[metric] = n
+        return result
+
+    def format(self) -> str:
+        """Return a plain-text table for a log, console or stats panel."""
+        header = ("device / command", "metric", "n", "mean", "p95", "max")
+        lines = ["{:<34} {:<16} {:>6} {:>8} {:>8} {:>8}".format(*header)]
+        for device, commands in sorted(self.snapshot().items()):
+            lines.append(device)
+            for command, metrics in sorted(commands.items()):
+                for metric, value in sorted(metrics.items()):
+                    if isinstance(value, dict):
+                        lines.append(
+                            f"  {command:<32} {metric:<16} {value['count']:>6} "
+                            f"{value['mean_ms']:>6.1f}ms {value['p95_ms']:>6.1f}ms "
+                            f"{value['max_ms']:>6.1f}ms"
+                        )
+                    else:
+                        lines.append(f"  {command:<32} {metric:<16} {value:>6}")
+        return "\n".join(lines)
+
+    def render_prometheus(self, prefix: str = "kickass_") -> str:
+        """Return histograms and counters in Prometheus text format."""
+        lines: list[str] = []
+        hists = sorted(list(self.histograms.items()))
+        counters = sorted(list(self.counters.items()))
+        if hists:
+            name = f"{prefix}ble_seconds"
+            lines += [f"# HELP {name} BLE path timings", f"# TYPE {name} histogram"]
+        for (device, command, metric), hist in hists:
+            labels = f'device="{device}",command="{command}",metric="{metric}"'
+            seen = 0
+            for bound, n in zip(BOUNDS, hist.buckets):
+                seen += n
+                lines.append(f'{prefix}ble_seconds_bucket{{{labels},le="{bound}"}} {seen}')
+            lines.append(f'{prefix}ble_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f"{prefix}ble_seconds_sum{{{labels}}} {hist.total}")
+            lines.append(f"{prefix}ble_seconds_count{{{labels}}} {hist.count}")
+        if counters:
+            name = f"{prefix}ble_events_total"
+            lines += [f"# HELP {name} BLE path failures and retries", f"# TYPE {name} counter"]
+        for (device, command, metric), n in counters:
+            labels = f'device="{device}",command="{command}",metric="{metric}"'
+            lines.append(f"{name}{{{labels}}} {n}")
+        return "\n".join(lines) + "\n" if lines else ""
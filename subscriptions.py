@@ -0,0 +1,128 @@
+"""Module delivering only meaningful changes of decoded samples to consumers."""
+
+import time
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import Any, Final
+
+from poller import Sample
+
+# Changes smaller than these are noise on a stable Home Data reading
+HOME_DATA_DEADBANDS: Final[dict[str, float]] = {
+    "battery_level": 1,
+    "battery_voltage": 0.05,
+    "battery_current": 0.05,
+    "charge_power": 1,
+    "controller_temperature": 1,
+    "battery_temperature": 1,
+}
+
+# The same for JK samples; keys are drivers.JKDriver.FIELDS names, which are
+# also the bms_ble ATTR_* keys of the BMSsample dicts kickass-bms.py returns
+JK_DEADBANDS: Final[dict[str, float]] = {
+    "voltage": 0.05,
+    "current": 0.05,
+    "battery_level": 1,
+    "cycle_charge": 0.1,
+    "temperature": 1,
+    "cycles": 0,  # any change
+}
+
+
+def bms_sample(address: str, data: Mapping[str, Any], timestamp: float | None = None) -> Sample:
+    """Wrap a BMSsample from kickass-bms.py as a Sample for publish().
+
+    data is copied, since a BMS built with reuse_sample refills its dict.
+    """
+    return Sample(time.time() if timestamp is None else timestamp, address, dict(data))
+
+
+@dataclass(slots=True, eq=False)
+class Subscription:
+    """A consumer of some fields, each with its own deadband.
+
+    A field is delivered when it moved at least its deadband away from the
+    value last delivered for that device (non-numeric values on any
+    change). With max_age every subscribed field is resent once the last
+    delivery is that many seconds old. With full, a delivery carries every
+    subscribed field rather than only the changed ones.
+    """
+
+    callback: Callable[[Sample], None]
+    deadbands: dict[str, float]
+    max_age: float | None = None
+    full: bool = False
+    delivered: int = 0
+    suppressed: int = 0
+    _last: dict[str, dict[str, Any]] = field(default_factory=dict, repr=False)
+    _sent_at: dict[str, float] = field(default_factory=dict, repr=False)
+
+    def offer(self, sample: Sample) -> bool:
+        """Deliver the meaningful part of sample; return True if delivered."""
+        last = self._last.setdefault(sample.address, {})
+        values = sample.values
+        changed = {}
+        for name, band in self.deadbands.items():
+            if name not in values:
+                continue
+            new = values[name]
+            old = last.get(name)
+            if old is None or _moved(old, new, band):
+                changed[name] = new
+        sent_at = self._sent_at.get(sample.address)
+        stale = (
+            self.max_age is not None
+            and sent_at is not None
+            and sample.timestamp - sent_at >= self.max_age
+        )
+        if not changed and not stale:
+            self.suppressed += 1
+            return False
+        if stale or self.full:
+            changed = {n: values[n] for n in self.deadbands if n in values}
+        last.update(changed)
+        self._sent_at[sample.address] = sample.timestamp
+        self.delivered += 1
+        self.callback(Sample(sample.timestamp, sample.address, changed))
+        return True
+
+
+def _moved(old: Any, new: Any, band: float) -> bool:
+    try:
+        return abs(new - old) >= band if band else new != old
+    except TypeError:
+        return new != old
+
+
+class SubscriptionHub:
+    """Fan decoded samples out to subscriptions; use publish as on_sample."""
+
+    def __init__(self) -> None:
+        """Initialize with no subscribers."""
+        self._subs: list[Subscription] = []
+
+    def subscribe(
+        self,
+        callback: Callable[[Sample], None],
+        fields: Mapping[str, float] | Iterable[str],
+        max_age: float | None = None,
+        full: bool = False,
+    ) -> Subscription:
+        """Register callback for fields, given as {name: deadband} or names.
+
+        Fields given by name alone are delivered on any change.
+        """
+        if not isinstance(fields, Mapping):
+            fields = dict.fromkeys(fields, 0.0)
+        sub = Subscription(callback, dict(fields), max_age, full)
+        self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        """Stop delivering to sub."""
+        if sub in self._subs:
+            self._subs.remove(sub)
+
+    def publish(self, sample: Sample) -> int:
+        """Offer sample to every subscription; return how many received it."""
+        return sum(sub.offer(sample) for sub in tuple(self._subs))
@@ -0,0 +1,247 @@
+"""Module to correlate Modbus requests with their BLE notification replies."""
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from framing import FrameReassembler
+from modbus import CRC_LEN, EXCEPTION_FLAG, ModbusError, expected_response
+from stats import ANY, Stats, command_name
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Pending:
+    address: int
+    function: int
+    length: int
+    future: asyncio.Future
+    timer: asyncio.TimerHandle | None = field(default=None)
+    command: str = ANY
+    sent: float = 0.0
+    first_byte: float | None = None
+
+
+class ModbusClient:
+    """Send Modbus requests over a BLEConnection and await matching replies."""
+
+    def __init__(
+        self,
+        conn: Any,
+        timeout: float = 2.0,
+        addresses: Iterable[int] = (1,),
+        stats: Stats | None = None,
+    ) -> None:
+        """Attach to conn, a BLEConnection or anything with the same API.
+
+        Timings go to stats, by default the connection's own.
+        """
+        self._conn = conn
+        self.stats = stats if stats is not None else getattr(conn, "stats", None)
+        self._device = getattr(conn, "address", ANY)
+        self._timeout = timeout
+        self._pending: list[_Pending] = []
+        self._framer = FrameReassembler(addresses=addresses)
+        self.frame_callbacks: list[Callable[[memoryview], None]] = []
+        self.timeouts: int = 0
+        conn.add_notify_callback(self._on_notify)
+
+    @property
+    def crc_errors(self) -> int:
+        """Return the number of frames rejected for a bad CRC."""
+        return self._framer.crc_errors
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of requests still waiting for a reply."""
+        return len(self._pending)
+
+    async def send(self, frame: bytes, timeout: float | None = None) -> asyncio.Future:
+        """Write frame and return a future resolving to the reply frame."""
+        loop = asyncio.get_running_loop()
+        address, function, length = expected_response(frame)
+        pending = _Pending(address, function, length, loop.create_future())
+        self._pending.append(pending)
+        pending.timer = loop.call_later(
+            self._timeout if timeout is None else timeout, self._expire, pending
+        )
+        if self.stats is not None:
+            pending.command = command_name(frame)
+        pending.sent = loop.time()
+        try:
+            await self._conn.write(frame)
+        except Exception as exc:
+            self._finish(pending, exc=exc)
+        else:
+            if self.stats is not None:
+                self._observe(pending, "write", loop.time() - pending.sent)
+        return pending.future
+
+    async def request(self, frame: bytes, timeout: float | None = None) -> bytes:
+        """Write frame and return the reply as soon as it is complete."""
+        return await (await self.send(frame, timeout))
+
+    def close(self) -> None:
+        """Detach from the connection and cancel outstanding requests."""
+        self._conn.remove_notify_callback(self._on_notify)
+        for pending in list(self._pending):
+            self._finish(pending, exc=asyncio.CancelledError())
+
+    def _expire(self, pending: _Pending) -> None:
+        self.timeouts += 1
+        if self.stats is not None:
+            self.stats.count(self._device, pending.command, "timeouts")
+        self._finish(pending, exc=TimeoutError("no reply from device"))
+
+    def _finish(
+        self, pending: _Pending, frame: bytes | None = None, exc: BaseException | None = None
+    ) -> None:
+        if pending in self._pending:
+            self._pending.remove(pending)
+        if pending.timer is not None:
+            pending.timer.cancel()
+        if pending.future.done():
+            return
+        if exc is not None:
+            pending.future.set_exception(exc)
+        else:
+            pending.future.set_result(frame)
+            if self.stats is not None:
+                now = asyncio.get_running_loop().time()
+                first = pending.first_byte if pending.first_byte is not None else now
+                self._observe(pending, "first_byte", first - pending.sent)
+                self._observe(pending, "frame", now - pending.sent)
+
+    def _observe(self, pending: _Pending, metric: str, seconds: float) -> None:
+        self.stats.observe(self._device, pending.command, metric, seconds)
+
+    def _on_notify(self, sender: Any, data: bytearray) -> None:
+        if self.stats is None:
+            for frame in self._framer.feed(data):
+                self._dispatch(frame)
+            return
+        # chunks answer the oldest request that has not started replying yet
+        waiting = next((p for p in self._pending if p.first_byte is None), None)
+        if waiting is not None:
+            waiting.first_byte = asyncio.get_running_loop().time()
+        command = self._pending[0].command if self._pending else ANY
+        crc_errors = self._framer.crc_errors
+        for frame in self._framer.feed(data):
+            self._dispatch(frame)
+        if self._framer.crc_errors != crc_errors:
+            self.stats.count(
+                self._device, command, "crc_errors", self._framer.crc_errors - crc_errors
+            )
+
+    def _dispatch(self, frame: memoryview) -> None:
+        for callback in tuple(self.frame_callbacks):
+            callback(frame)
+        address, function = frame[0], frame[1]
+        for pending in self._pending:
+            if pending.address != address:
+                continue
+            if function == pending.function | EXCEPTION_FLAG:
+                self._finish(pending, exc=ModbusError(pending.function, frame[2]))
+                return
+            if function == pending.function and len(frame) == pending.length:
+                # the framer reuses its buffer, so the result gets its own copy
+                self._finish(pending, bytes(frame))
+                return
+        _LOGGER.debug("unsolicited frame %s", frame[:-CRC_LEN].hex())
+
+
+class StreamClient:
+    """Request/reply over a device that answers with framed, streamed data.
+
+    For protocols without addressed replies (JK BMS): each request is
+    answered by the next complete frame that accept() takes. Frames that
+    arrive while nothing waits are dropped.
+    """
+
+    def __init__(
+        self,
+        conn: Any,
+        framer: Any,
+        accept: Callable[[memoryview], bool],
+        timeout: float = 5.0,
+        stats: Stats | None = None,
+    ) -> None:
+        """Attach to conn; framer.feed(chunk) must return complete frames."""
+        self._conn = conn
+        self._framer = framer
+        self._accept = accept
+        self._timeout = timeout
+        self.stats = stats if stats is not None else getattr(conn, "stats", None)
+        self._device = getattr(conn, "address", ANY)
+        self._pending: list[_Pending] = []
+        self.frame_callbacks: list[Callable[[memoryview], None]] = []
+        self.timeouts: int = 0
+        conn.add_notify_callback(self._on_notify)
+
+    @property
+    def crc_errors(self) -> int:
+        """Return the number of frames rejected for a bad checksum."""
+        return getattr(self._framer, "crc_errors", 0)
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of requests still waiting for a reply."""
+        return len(self._pending)
+
+    async def send(self, frame: bytes, timeout: float | None = None) -> asyncio.Future:
+        """Write frame and return a future resolving to the next accepted frame."""
+        loop = asyncio.get_running_loop()
+        pending = _Pending(0, 0, 0, loop.create_future(), command=command_name(frame))
+        self._pending.append(pending)
+        pending.timer = loop.call_later(
+            self._timeout if timeout is None else timeout, self._expire, pending
+        )
+        pending.sent = loop.time()
+        try:
+            await self._conn.write(frame)
+        except Exception as exc:
+            self._finish(pending, exc=exc)
+        return pending.future
+
+    async def request(self, frame: bytes, timeout: float | None = None) -> bytes:
+        """Write frame and return the reply as soon as it is complete."""
+        return await (await self.send(frame, timeout))
+
+    def close(self) -> None:
+        """Detach from the connection and cancel outstanding requests."""
+        self._conn.remove_notify_callback(self._on_notify)
+        for pending in list(self._pending):
+            self._finish(pending, exc=asyncio.CancelledError())
+
+    def _expire(self, pending: _Pending) -> None:
+        self.timeouts += 1
+        if self.stats is not None:
+            self.stats.count(self._device, pending.command, "timeouts")
+        self._finish(pending, exc=TimeoutError("no reply from device"))
+
+    def _finish(
+        self, pending: _Pending, frame: bytes | None = None, exc: BaseException | None = None
+    ) -> None:
+        if pending in self._pending:
+            self._pending.remove(pending)
+        if pending.timer is not None:
+            pending.timer.cancel()
+        if pending.future.done():
+            return
+        if exc is not None:
+            pending.future.set_exception(exc)
+            return
+        pending.future.set_result(frame)
+        if self.stats is not None:
+            seconds = asyncio.get_running_loop().time() - pending.sent
+            self.stats.observe(self._device, pending.command, "frame", seconds)
+
+    def _on_notify(self, sender: Any, data: bytearray) -> None:
+        for frame in self._framer.feed(data):
+            for callback in tuple(self.frame_callbacks):
+                callback(frame)
+            if self._pending and self._accept(frame):
+                self._finish(self._pending[0], bytes(frame))
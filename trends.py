@@ -0,0 +1,113 @@
+"""Module with preallocated ring buffers of telemetry and min/max decimation."""
+
+from collections.abc import Iterable
+from typing import Any, Final
+
+# The Home Data channels worth charting
+TREND_FIELDS: Final = (
+    "battery_voltage",
+    "battery_current",
+    "charge_power",
+    "controller_temperature",
+    "battery_temperature",
+)
+DAY_AT_10HZ: Final[int] = 24 * 3600 * 10
+
+
+class TrendBuffer:
+    """Fixed-capacity ring of timestamps plus one float32 array per field.
+
+    append() only writes into preallocated arrays, so the poll path never
+    allocates. Readers work on at most two contiguous views of the ring and
+    never copy it. The slot is filled before head and count move, so a
+    reader on another thread sees at worst the previous sample.
+    """
+
+    def __init__(self, fields: Iterable[str] = TREND_FIELDS, capacity: int = DAY_AT_10HZ) -> None:
+        """Allocate capacity slots, about 8 + 4 * len(fields) bytes each."""
+        import numpy as np
+
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)
+        self.values = {f: np.full(capacity, np.nan, dtype=np.float32) for f in self.fields}
+        self.head = 0  # next slot to write
+        self.count = 0
+        self.version = 0  # bumped per append so views can skip idle repaints
+        self._latest: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self.count
+
+    def append(self, timestamp: float, values: dict[str, Any]) -> None:
+        """Store one sample; fields it lacks are recorded as NaN.
+
+        Samples carrying none of the fields (e.g. a cycle that only read
+        slower blocks) are skipped rather than stored as empty rows.
+        """
+        if not any(values.get(field) is not None for field in self.fields):
+            return
+        head = self.head
+        self.times[head] = timestamp
+        for field, column in self.values.items():
+            value = values.get(field)
+            if value is None:
+                column[head] = float("nan")
+            else:
+                column[head] = value
+                if value == value:
+                    self._latest[field] = float(value)
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.version += 1
+
+    @property
+    def last_time(self) -> float | None:
+        """Return the newest timestamp, or None when empty."""
+        return float(self.times[self.head - 1]) if self.count else None
+
+    def latest(self, field: str) -> float | None:
+        """Return the newest finite value of field, or None if there is none."""
+        return self._latest.get(field)
+
+    def _parts(self) -> list[slice]:
+        """Return the filled slots as up to two slices in time order."""
+        head, count = self.head, self.count
+        if count < self.capacity:
+            return [slice(0, head)]
+        return [slice(head, self.capacity), slice(0, head)]
+
+    def decimate(
+        self, field: str, start: float, end: float, columns: int
+    ) -> tuple[Any, Any, Any]:
+        """Return per-column (time, min, max) of field between start and end.
+
+        Each of the columns buckets covers an equal time slice; empty buckets
+        are NaN. Bucket edges are found with searchsorted and reduced with
+        fmin/fmax.reduceat on views of the ring, so the cost is one pass over
+        the samples in range and no copy of the buffer.
+        """
+        import numpy as np
+
+        edges = np.linspace(start, end, columns + 1)
+        low = np.full(columns, np.nan, dtype=np.float32)
+        high = np.full(columns, np.nan, dtype=np.float32)
+        column = self.values[field]
+        for part in self._parts():
+            times = self.times[part]
+            values = column[part]
+            first = np.searchsorted(times, start)
+            last = np.searchsorted(times, end, side="right")
+            if first >= last:
+                continue
+            bounds = np.searchsorted(times[first:last], edges[:-1]) + first
+            filled = np.flatnonzero(np.diff(np.append(bounds, last)) > 0)
+            if not len(filled):
+                continue
+            starts = bounds[filled]
+            view = values[:last]  # reduceat runs the final bucket up to the end
+            low[filled] = np.fmin(low[filled], np.fmin.reduceat(view, starts))
+            high[filled] = np.fmax(high[filled], np.fmax.reduceat(view, starts))
+        return (edges[:-1] + edges[1:]) / 2, low, high
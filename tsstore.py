@@ -0,0 +1,231 @@
+"""Module with an append-only, memory-mapped store of decoded samples."""
+
+import bisect
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from typing import Any, Final
+
+from registers import HOME_DATA
+
+META_FILE: Final = "store.json"
+SEGMENT_SUFFIX: Final = ".bin"
+DAY: Final[int] = 86400
+
+
+class _Timestamps(Sequence):
+    """Lazy view of the timestamps in a mapped segment, for bisect."""
+
+    def __init__(self, buf: mmap.mmap, record: struct.Struct, count: int) -> None:
+        self._buf, self._size, self._count = buf, record.size, count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> float:
+        return struct.unpack_from("<d", self._buf, index * self._size)[0]
+
+
+class SampleStore:
+    """Fixed-size little-endian records split into one file per UTC day.
+
+    A record is timestamp (float64), device id (uint16) and one float32 per
+    field, NaN when a sample lacks that field. Records are appended in time
+    order, which lets range queries bisect each mapped segment.
+    """
+
+    def __init__(self, path: str, fields: Sequence[str] = HOME_DATA.names) -> None:
+        """Open or create the store directory at path."""
+        self.path: Final = path
+        self.fields: Final = tuple(fields)
+        self.record: Final = struct.Struct(f"<dH{len(self.fields)}f")
+        os.makedirs(path, exist_ok=True)
+        self._devices: dict[str, int] = {}
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            if tuple(meta["fields"]) != self.fields:
+                raise ValueError(f"{path} holds fields {meta['fields']}, not {self.fields}")
+            self._devices = meta["devices"]
+        self._names = {idx: address for address, idx in self._devices.items()}
+        self._lock = threading.Lock()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        self.written: int = 0
+
+    # -- writing ---------------------------------------------------------
+
+    def device_id(self, address: str) -> int:
+        """Return the numeric id of address, assigning one if new."""
+        idx = self._devices.get(address)
+        if idx is None:
+            with self._lock:
+                idx = self._devices.setdefault(address, len(self._devices))
+                self._names[idx] = address
+                self._queue.put(None)  # ask the writer to persist the metadata
+        return idx
+
+    def append(self, sample: Any) -> None:
+        """Queue a poller Sample for writing; never blocks on disk I/O."""
+        nan = float("nan")
+        values = sample.values
+        self._queue.put(
+            self.record.pack(
+                sample.timestamp,
+                self.device_id(sample.address),
+                *(float(values.get(name, nan)) for name in self.fields),
+            )
+        )
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="tsstore-writer", daemon=True
+            )
+            self._writer.start()
+
+    def close(self) -> None:
+        """Flush queued records and stop the writer thread."""
+        if self._writer is not None:
+            self._queue.put(b"")
+            self._writer.join()
+            self._writer = None
+
+    def _write_loop(self) -> None:
+        files: dict[int, Any] = {}
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = False
+                for item in batch:
+                    if item is None:
+                        self._save_meta()
+                    elif item == b"":
+                        stop = True
+                    else:
+                        day = int(struct.unpack_from("<d", item)[0] // DAY)
+                        file = files.get(day)
+                        if file is None:
+                            for old in files.values():
+                                old.close()
+                            files = {day: open(self._segment(day), "ab")}
+                            file = files[day]
+                        file.write(item)
+                        self.written += 1
+                for file in files.values():
+                    file.flush()
+                if stop:
+                    return
+        finally:
+            for file in files.values():
+                file.close()
+
+    def _save_meta(self) -> None:
+        with self._lock:
+            meta = {"fields": list(self.fields), "devices": dict(self._devices)}
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+    # -- reading ---------------------------------------------------------
+
+    def _segment(self, day: int) -> str:
+        return os.path.join(
+            self.path, time.strftime("%Y%m%d", time.gmtime(day * DAY)) + SEGMENT_SUFFIX
+        )
+
+    def _segments(self, start: float, end: float) -> Iterator[tuple[mmap.mmap, int]]:
+        for day in range(int(start // DAY), int(end // DAY) + 1):
+            name = self._segment(day)
+            if not os.path.exists(name):
+                continue
+            with open(name, "rb") as file:
+                count = os.fstat(file.fileno()).st_size // self.record.size
+                if not count:
+                    continue
+                buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield buf, count
+            finally:
+                buf.close()
+
+    def query(
+        self, start: float, end: float, address: str | None = None
+    ) -> Iterator[tuple[float, str, dict[str, float]]]:
+        """Yield (timestamp, address, values) for start <= t < end."""
+        want = None if address is None else self._devices.get(address, -1)
+        unpack, size = self.record.unpack_from, self.record.size
+        for buf, count in self._segments(start, end):
+            stamps = _Timestamps(buf, self.record, count)
+            first = bisect.bisect_left(stamps, start)
+            last = bisect.bisect_left(stamps, end, first)
+            for idx in range(first, last):
+                stamp, dev, *values = unpack(buf, idx * size)
+                if want is None or dev == want:
+                    name = self._names.get(dev, str(dev))
+                    yield stamp, name, dict(zip(self.fields, values))
+
+    @property
+    def dtype(self) -> Any:
+        """Return the NumPy structured dtype of one record."""
+        import numpy as np
+
+        return np.dtype(
+            [("timestamp", "<f8"), ("device", "<u2")] + [(f, "<f4") for f in self.fields]
+        )
+
+    def downsample(
+        self, start: float, end: float, points: int, address: str | None = None
+    ) -> dict[str, Any]:
+        """Return per-bucket min/max/mean of every field over points buckets.
+
+        Segments are reduced one at a time straight from the mapped files,
+        so memory use is bounded by a day of records, not the whole range.
+        """
+        import numpy as np
+
+        dtype = self.dtype
+        width = (end - start) / points
+        result: dict[str, Any] = {"time": start + width * (np.arange(points) + 0.5)}
+        # per field: running min, max, sum and count of finite values
+        acc = {
+            f: (np.full(points, np.nan), np.full(points, np.nan), np.zeros(points), np.zeros(points))
+            for f in self.fields
+        }
+        want = None if address is None else self._devices.get(address, -1)
+        for buf, count in self._segments(start, end):
+            rec = np.frombuffer(buf, dtype=dtype, count=count)
+            stamps = rec["timestamp"]
+            try:
+                rec = rec[np.searchsorted(stamps, start) : np.searchsorted(stamps, end)]
+                if want is not None:
+                    rec = rec[rec["device"] == want]
+                if not len(rec):
+                    continue
+                bucket = ((rec["timestamp"] - start) // width).astype(np.intp)
+                np.clip(bucket, 0, points - 1, out=bucket)
+                for name, (lo, hi, total, seen) in acc.items():
+                    col = rec[name].astype(np.float64)
+                    np.fmin.at(lo, bucket, col)
+                    np.fmax.at(hi, bucket, col)
+                    finite = np.isfinite(col)
+                    total += np.bincount(bucket, np.where(finite, col, 0.0), points)
+                    seen += np.bincount(bucket, finite, points)
+            finally:
+                del rec, stamps  # release the views before the map is closed
+        for name, (lo, hi, total, seen) in acc.items():
+            result[f"{name}_min"] = lo
+            result[f"{name}_max"] = hi
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[f"{name}_mean"] = total / seen
+        return result
@@ -0,0 +1,198 @@
+"""Module with bounded, rate-limited PyQt6 views for live telemetry."""
+
+from collections import deque
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from PyQt6.QtCore import QPointF, QTimer, pyqtSlot
+from PyQt6.QtGui import QColor, QPainter, QPaintEvent, QPen, QPolygonF
+from PyQt6.QtWidgets import QFormLayout, QLabel, QPlainTextEdit, QWidget
+
+from trends import TrendBuffer
+
+_TREND_COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd")
+
+
+class LogView(QPlainTextEdit):
+    """Read-only log holding at most max_lines, repainted at most rate_hz."""
+
+    def __init__(
+        self, parent: QWidget | None = None, max_lines: int = 2000, rate_hz: float = 10.0
+    ) -> None:
+        """Initialize the view and its flush timer."""
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self._pending: deque[str] = deque(maxlen=max_lines)
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(1000 / rate_hz))
+        self._timer.timeout.connect(self._flush)
+        self._timer.start()
+
+    @pyqtSlot(str)
+    def append(self, text: str) -> None:
+        """Queue text; it is shown on the next flush."""
+        self._pending.append(text)
+
+    def setText(self, text: str) -> None:
+        """Replace the whole log with text."""
+        self._pending.clear()
+        self.setPlainText(text)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        lines = "\n".join(self._pending)
+        self._pending.clear()
+        self.setUpdatesEnabled(False)
+        self.appendPlainText(lines)
+        self.setUpdatesEnabled(True)
+
+
+class TelemetryPanel(QWidget):
+    """Fixed fields showing the latest value of each telemetry channel."""
+
+    def __init__(
+        self,
+        fields: Iterable[tuple[str, str]],
+        parent: QWidget | None = None,
+        rate_hz: float = 10.0,
+    ) -> None:
+        """Create one row per (name, unit) field."""
+        super().__init__(parent)
+        layout = QFormLayout(self)
+        self._labels: dict[str, QLabel] = {}
+        self._units: dict[str, str] = {}
+        for name, unit in fields:
+            label = QLabel("-", self)
+            layout.addRow(name.replace("_", " ").title() + ":", label)
+            self._labels[name] = label
+            self._units[name] = unit
+        self._latest: dict[str, Any] = {}
+        self._shown: dict[str, str] = {}
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(1000 / rate_hz))
+        self._timer.timeout.connect(self._flush)
+        self._timer.start()
+
+    @pyqtSlot(object)
+    def update_values(self, values: dict[str, Any]) -> None:
+        """Record new values; labels are refreshed on the next flush."""
+        self._latest.update(values)
+
+    def _flush(self) -> None:
+        if not self._latest:
+            return
+        for name, value in self._latest.items():
+            label = self._labels.get(name)
+            if label is None:
+                continue
+            unit = self._units[name]
+            text = f"{value:.2f} {unit}" if isinstance(value, float) else f"{value} {unit}"
+            if self._shown.get(name) != text:
+                self._shown[name] = text
+                label.setText(text)
+        self._latest.clear()
+
+
+class StatsPanel(QPlainTextEdit):
+    """Read-only text refreshed from source() every interval seconds."""
+
+    def __init__(
+        self, source: Callable[[], str], parent: QWidget | None = None, interval: float = 1.0
+    ) -> None:
+        """Initialize the panel and its refresh timer."""
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self._source = source
+        self._text = ""
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(1000 * interval))
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+
+    def _refresh(self) -> None:
+        if not self.isVisible():
+            return
+        text = self._source()
+        if text != self._text:
+            self._text = text
+            self.setPlainText(text)
+
+
+class TrendPlot(QWidget):
+    """One stacked lane per TrendBuffer field over the last window seconds.
+
+    Appends only bump the buffer's version; a timer repaints at most rate_hz
+    and only when it changed. Each lane draws the min/max of every pixel
+    column, so the cost follows the widget width, not the window length.
+    """
+
+    def __init__(
+        self,
+        buffer: TrendBuffer,
+        units: dict[str, str],
+        parent: QWidget | None = None,
+        window: float = 600.0,
+        rate_hz: float = 5.0,
+    ) -> None:
+        """Initialize the plot and its repaint timer."""
+        super().__init__(parent)
+        self.buffer = buffer
+        self.window = window
+        self._units = units
+        self._painted = -1
+        self.setMinimumHeight(60 * len(buffer.fields))
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(1000 / rate_hz))
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+
+    def set_window(self, seconds: float) -> None:
+        """Show the last seconds of data."""
+        self.window = seconds
+        self.update()
+
+    def _refresh(self) -> None:
+        if self.isVisible() and self.buffer.version != self._painted:
+            self.update()
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        self._painted = self.buffer.version
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        end = self.buffer.last_time
+        if end is not None:
+            fields = self.buffer.fields
+            lane = self.height() / len(fields)
+            for idx, field in enumerate(fields):
+                color = QColor(_TREND_COLORS[idx % len(_TREND_COLORS)])
+                self._paint_lane(painter, field, idx * lane, lane, end, color)
+        painter.end()
+
+    def _paint_lane(
+        self, painter: QPainter, field: str, top: float, height: float, end: float, color: QColor
+    ) -> None:
+        _, low, high = self.buffer.decimate(field, end - self.window, end, max(1, self.width()))
+        low, high = low.tolist(), high.tolist()
+        finite = [v for v in low + high if v == v]  # NaN marks empty columns
+        if not finite:
+            return
+        vmin, vmax = min(finite), max(finite)
+        scale = (height - 18) / ((vmax - vmin) or 1.0)
+        base = top + height - 2
+        points = []
+        for x, (lo, hi) in enumerate(zip(low, high)):
+            if lo == lo:
+                points.append(QPointF(x, base - (lo - vmin) * scale))
+                points.append(QPointF(x, base - (hi - vmin) * scale))
+        painter.setPen(QPen(color, 1))
+        painter.drawPolyline(QPolygonF(points))
+        unit = self._units.get(field, "")
+        title = field.replace("_", " ").title()
+        painter.setPen(self.palette().text().color())
+        painter.drawText(
+            QPointF(4, top + 12),
+            f"{title}: {self.buffer.latest(field):.2f} {unit}   [{vmin:.2f} .. {vmax:.2f}]",
+        )